@@ -1,18 +1,57 @@
+import os
+import time
 import sqlite3
+import threading
+
+# PRAGMA settings applied when a connection is opened, by workload
+CONNECTION_PROFILES = {
+    # SQLite defaults: rollback journal, ~2 MB page cache, no mmap
+    'default': {},
+    # Many concurrent readers: WAL lets reads run alongside a writer
+    'read-heavy': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,        # 64 MB
+        'mmap_size': 268435456,      # 256 MB
+        'temp_store': 'MEMORY',
+    },
+    # Frequent small transactions: WAL + NORMAL avoids an fsync per commit
+    'write-heavy': {
+        'busy_timeout': 10000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -32768,        # 32 MB
+        'mmap_size': 67108864,       # 64 MB
+        'wal_autocheckpoint': 1000,
+    },
+    # One-off imports: durability traded for speed, reload on crash
+    'bulk-load': {
+        'busy_timeout': 30000,
+        'journal_mode': 'MEMORY',
+        'synchronous': 'OFF',
+        'cache_size': -262144,       # 256 MB
+        'temp_store': 'MEMORY',
+    },
+}
 
 class DatabaseConnection:
     """
     A context manager class that handles opening and closing database connections automatically.
     """
     
-    def __init__(self, database_path):
+    def __init__(self, database_path, profile='default'):
         """
         Initialize the context manager with the database path.
         
         Args:
             database_path (str): Path to the SQLite database file
+            profile (str): Name of the CONNECTION_PROFILES entry to apply
         """
+        if profile not in CONNECTION_PROFILES:
+            raise ValueError(f"Unknown connection profile {profile!r}, expected one of {sorted(CONNECTION_PROFILES)}")
         self.database_path = database_path
+        self.profile = profile
         self.connection = None
     
     def __enter__(self):
@@ -25,6 +64,8 @@ class DatabaseConnection:
         print(f"🔗 Opening database connection to: {self.database_path}")
         try:
             self.connection = sqlite3.connect(self.database_path)
+            for name, value in CONNECTION_PROFILES[self.profile].items():
+                self.connection.execute(f"PRAGMA {name} = {value}").fetchall()
             print("✅ Database connection established successfully")
             return self.connection
         except sqlite3.Error as e:
@@ -64,6 +105,98 @@ class DatabaseConnection:
         # Return False to propagate any exceptions that occurred
         return False
 
+class PooledDatabaseConnection:
+    """
+    Drop-in variant of DatabaseConnection that reuses warm connections.
+
+    __enter__ checks a connection out of a process-wide pool (one per
+    database path and profile) instead of opening a new one, and __exit__
+    commits or rolls back and hands it back, so tight loops of short
+    `with` blocks don't pay connection setup each time. Instead of printing,
+    it counts what happened in PooledDatabaseConnection.counters.
+    """
+
+    max_idle = 8          # warm connections kept per database/profile
+    _pools = {}           # (database_path, profile) -> [idle connections]
+    _lock = threading.Lock()
+    counters = {'opened': 0, 'reused': 0, 'committed': 0, 'rolled_back': 0,
+                'discarded': 0, 'closed': 0}
+
+    def __init__(self, database_path, profile='default'):
+        """
+        Args:
+            database_path (str): Path to the SQLite database file
+            profile (str): Name of the CONNECTION_PROFILES entry to apply to new connections
+        """
+        if profile not in CONNECTION_PROFILES:
+            raise ValueError(f"Unknown connection profile {profile!r}, expected one of {sorted(CONNECTION_PROFILES)}")
+        self.key = (database_path, profile)
+        self.database_path = database_path
+        self.profile = profile
+        self.connection = None
+
+    def __enter__(self):
+        """
+        Check out a pooled connection, opening one only if none is idle.
+
+        Returns:
+            sqlite3.Connection: The database connection object
+        """
+        with self._lock:
+            idle = self._pools.get(self.key)
+            if idle:
+                self.connection = idle.pop()
+                self.counters['reused'] += 1
+                return self.connection
+            self.counters['opened'] += 1
+        self.connection = sqlite3.connect(self.database_path, check_same_thread=False)
+        for name, value in CONNECTION_PROFILES[self.profile].items():
+            self.connection.execute(f"PRAGMA {name} = {value}").fetchall()
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Commit (or roll back on exception) and return the connection to the pool.
+
+        Returns:
+            bool: False to propagate exceptions
+        """
+        conn, self.connection = self.connection, None
+        if conn is None:
+            return False
+        try:
+            if exc_type is None:
+                conn.commit()
+                outcome = 'committed'
+            else:
+                conn.rollback()
+                outcome = 'rolled_back'
+        except sqlite3.Error:
+            # A connection that can't finish its transaction isn't reused
+            conn.close()
+            with self._lock:
+                self.counters['discarded'] += 1
+            return False
+        with self._lock:
+            self.counters[outcome] += 1
+            idle = self._pools.setdefault(self.key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return False
+            self.counters['closed'] += 1
+        conn.close()
+        return False
+
+    @classmethod
+    def close_all(cls):
+        """Close every idle pooled connection."""
+        with cls._lock:
+            for idle in cls._pools.values():
+                for conn in idle:
+                    conn.close()
+                cls.counters['closed'] += len(idle)
+                idle.clear()
+
 # Example usage with SELECT query
 def fetch_all_users():
     """Fetch all users using the context manager"""
@@ -160,6 +293,63 @@ def setup_sample_database():
         
         print("🎯 Sample database created with test data")
 
+# Benchmark the connection profiles against a representative workload
+def benchmark_profiles(rows=50000, point_reads=5000, small_writes=500, database_path='profile_benchmark.db'):
+    """
+    Run the same workload under every connection profile on a fresh database
+    and print the time each phase took.
+
+    Phases: bulk insert of `rows` users in one transaction, `point_reads`
+    lookups by id, `small_writes` single-row update transactions (one commit
+    each), and a full-table aggregate scan.
+    """
+    import contextlib
+    import io
+    import random
+
+    def phase(conn, work):
+        started = time.perf_counter()
+        work(conn)
+        return time.perf_counter() - started
+
+    def bulk_insert(conn):
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+                     "email TEXT UNIQUE NOT NULL, age INTEGER NOT NULL)")
+        conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                         ((i, f"user{i}", f"user{i}@example.com", 18 + i % 60) for i in range(rows)))
+        conn.commit()
+
+    def reads(conn):
+        cursor = conn.cursor()
+        for user_id in random.sample(range(rows), min(point_reads, rows)):
+            cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+
+    def writes(conn):
+        for user_id in random.sample(range(rows), min(small_writes, rows)):
+            conn.execute("UPDATE users SET age = age + 1 WHERE id = ?", (user_id,))
+            conn.commit()
+
+    def scan(conn):
+        conn.execute("SELECT age, COUNT(*), AVG(id) FROM users GROUP BY age").fetchall()
+
+    results = {}
+    for profile in CONNECTION_PROFILES:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(database_path + suffix):
+                os.remove(database_path + suffix)
+        # Silence the context manager's own logging while timing
+        with contextlib.redirect_stdout(io.StringIO()):
+            with DatabaseConnection(database_path, profile=profile) as conn:
+                results[profile] = [phase(conn, work) for work in (bulk_insert, reads, writes, scan)]
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(database_path + suffix):
+            os.remove(database_path + suffix)
+
+    print(f"{'Profile':<12} {'Bulk insert':>12} {'Point reads':>12} {'Small writes':>13} {'Scan':>9}")
+    for profile, timings in results.items():
+        print(f"{profile:<12} " + " ".join(f"{seconds * 1000:>11.1f}ms" for seconds in timings))
+    return results
+
 if __name__ == "__main__":
     print("=" * 60)
     print("🗄️  Database Context Manager Implementation")
@@ -186,4 +376,10 @@ if __name__ == "__main__":
     print("=" * 30)
     fetch_users_with_error_example()
     
+    # Connection profile benchmark
+    print("\n" + "=" * 30)
+    print("BENCHMARK: Connection Profiles")
+    print("=" * 30)
+    benchmark_profiles()
+    
     print("\n✨ Context manager demonstrations complete!")
\ No newline at end of file
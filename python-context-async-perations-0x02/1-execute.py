@@ -1,12 +1,25 @@
+import os
+import time
 import sqlite3
+import tempfile
+from itertools import islice
 
 class ExecuteQuery:
     """
     Custom context manager that executes a parameterized SQL query
     and handles the complete database operation lifecycle.
+
+    With stream=True the block receives a lazy row iterator backed by
+    fetchmany(), so large results never sit in memory at once, and leaving
+    the block stops fetching.
+
+    With bulk_parameters=<iterable of tuples> the query runs through
+    executemany() in chunks of chunk_size inside a single transaction, and
+    the block receives the write statistics (rows/sec, per-chunk latency).
     """
     
-    def __init__(self, database_path, query, parameters=None):
+    def __init__(self, database_path, query, parameters=None, stream=False, batch_size=1000,
+                 bulk_parameters=None, chunk_size=1000):
         """
         Initialize the query context manager.
         
@@ -14,10 +27,22 @@ class ExecuteQuery:
             database_path (str): Path to the SQLite database file
             query (str): SQL query to execute (with placeholders if needed)
             parameters (tuple/list): Parameters for the SQL query placeholders
+            stream (bool): Yield rows lazily instead of fetching them all up front
+            batch_size (int): Rows fetched per fetchmany() call when streaming
+            bulk_parameters (iterable): Parameter tuples to run the query with via
+                executemany(), in one transaction (bulk mode)
+            chunk_size (int): Parameter tuples per executemany() call in bulk mode
         """
+        if stream and bulk_parameters is not None:
+            raise ValueError("stream=True and bulk_parameters can't be combined: bulk mode returns "
+                             "write statistics, not rows")
         self.database_path = database_path
         self.query = query
         self.parameters = parameters or ()
+        self.stream = stream
+        self.batch_size = batch_size
+        self.bulk_parameters = bulk_parameters
+        self.chunk_size = chunk_size
         self.connection = None
         self.cursor = None
         self.results = None
@@ -27,7 +52,8 @@ class ExecuteQuery:
         Context entry - establish connection and execute the query.
         
         Returns:
-            list: Query results from the executed SQL statement
+            list: Query results from the executed SQL statement, an iterator
+                over them in streaming mode, or write statistics in bulk mode
         """
         print(f"🔗 Connecting to database: {self.database_path}")
         
@@ -37,6 +63,10 @@ class ExecuteQuery:
             self.cursor = self.connection.cursor()
             print(" Database connection established")
             
+            if self.bulk_parameters is not None:
+                self.results = self._execute_bulk()
+                return self.results
+            
             # Execute the query with parameters
             print(f" Executing query: {self.query}")
             if self.parameters:
@@ -45,6 +75,12 @@ class ExecuteQuery:
             else:
                 self.cursor.execute(self.query)
             
+            if self.stream:
+                # Hand out a lazy iterator; rows are fetched as the body consumes them
+                self.results = self._iter_rows()
+                print(f" Query executed successfully - streaming rows in batches of {self.batch_size}")
+                return self.results
+            
             # Fetch and store results
             self.results = self.cursor.fetchall()
             print(f" Query executed successfully - {len(self.results)} rows retrieved")
@@ -64,6 +100,51 @@ class ExecuteQuery:
                 self.connection.close()
             raise
     
+    def _execute_bulk(self):
+        """
+        Stream the parameter tuples through executemany() in chunks, all in
+        one transaction (committed or rolled back by __exit__).
+        
+        Returns:
+            dict: rows written, chunks, elapsed seconds, rows/sec and per-chunk latencies (ms)
+        """
+        print(f" Executing bulk query: {self.query} (chunks of {self.chunk_size})")
+        if not self.connection.in_transaction:
+            self.connection.execute("BEGIN")
+        parameters = iter(self.bulk_parameters)
+        latencies = []
+        rows = 0
+        started = time.perf_counter()
+        while True:
+            chunk = list(islice(parameters, self.chunk_size))
+            if not chunk:
+                break
+            chunk_started = time.perf_counter()
+            self.cursor.executemany(self.query, chunk)
+            latencies.append((time.perf_counter() - chunk_started) * 1000)
+            rows += len(chunk)
+        elapsed = time.perf_counter() - started
+        stats = {
+            'rows': rows,
+            'chunks': len(latencies),
+            'seconds': elapsed,
+            'rows_per_sec': rows / elapsed if elapsed else 0.0,
+            'chunk_latency_ms': latencies,
+        }
+        if latencies:
+            print(f" Bulk write: {rows} rows in {len(latencies)} chunks, {stats['rows_per_sec']:.0f} rows/sec, "
+                  f"chunk latency min/avg/max {min(latencies):.2f}/{sum(latencies) / len(latencies):.2f}/"
+                  f"{max(latencies):.2f} ms")
+        return stats
+    
+    def _iter_rows(self):
+        """Yield rows from the open cursor, at most `batch_size` in memory at a time."""
+        while self.cursor is not None:
+            rows = self.cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            yield from rows
+    
     def __exit__(self, exc_type, exc_value, traceback):
         """
         Context cleanup - close cursor and database connection.
@@ -77,9 +158,14 @@ class ExecuteQuery:
             bool: False to allow exceptions to propagate
         """
         try:
+            # Stop a streaming iterator so nothing more is fetched after the block
+            if self.stream and self.results is not None:
+                self.results.close()
+            
             # Close cursor if it exists
             if self.cursor:
                 self.cursor.close()
+                self.cursor = None
                 print(" Database cursor closed")
             
             # Handle connection cleanup
@@ -199,6 +285,43 @@ def example_different_queries():
                 print(f"   • {name} (Age: {age})")
     except Exception as e:
         print(f"    Error: {e}")
+    
+    # Example 4: Streaming a large result with bounded memory
+    print("\n4️ Streaming users (first 3 only, fetching stops on exit):")
+    try:
+        with ExecuteQuery('users.db', "SELECT name, age FROM users ORDER BY age",
+                         stream=True, batch_size=2) as rows:
+            for i, (name, age) in enumerate(rows):
+                if i == 3:
+                    break
+                print(f"   • {name} (Age: {age})")
+    except Exception as e:
+        print(f"    Error: {e}")
+
+# Example showing bulk writes
+def example_bulk_insert():
+    """
+    Insert many rows with one ExecuteQuery block using bulk mode, into a
+    throwaway database so the other examples' users.db is left untouched
+    """
+    
+    print("\n" + "=" * 50)
+    print(" EXAMPLE: Bulk Insert")
+    print("=" * 50)
+    
+    new_users = ((100 + i, f'Bulk User {i}', f'bulk{i}@example.com', 20 + i % 40) for i in range(5000))
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, 'bulk_users.db')
+        conn = sqlite3.connect(database_path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+        conn.close()
+        try:
+            with ExecuteQuery(database_path,
+                             'INSERT OR REPLACE INTO users (id, name, email, age) VALUES (?, ?, ?, ?)',
+                             bulk_parameters=new_users, chunk_size=500) as stats:
+                print(f"   Inserted {stats['rows']} rows at {stats['rows_per_sec']:.0f} rows/sec")
+        except Exception as e:
+            print(f"    Error: {e}")
 
 # Example showing error handling
 def example_error_handling():
@@ -232,6 +355,9 @@ if __name__ == "__main__":
     # Additional examples
     example_different_queries()
     
+    # Bulk write demonstration
+    example_bulk_insert()
+    
     # Error handling demonstration
     example_error_handling()
     
@@ -1,6 +1,14 @@
+import os
+import time
 import asyncio
+import statistics
+import tempfile
 import aiosqlite
 import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, nullcontext
+from pathlib import Path
 from datetime import datetime
 
 # First, let's set up a sample database with users
@@ -40,6 +48,438 @@ def setup_sample_database():
         
         print("Async sample database created with user data")
 
+class AsyncConnectionPool:
+    """
+    Fixed-size pool of warm aiosqlite connections.
+
+    Every aiosqlite connection runs its own thread, so opening one per query
+    means one thread per concurrent query. The pool caps that at `size`
+    connections; extra callers queue in arrival order and each released
+    connection is handed straight to the longest-waiting caller, so nobody
+    can jump the queue. Acquire latency is recorded for every checkout.
+
+    Connections stay open while at least one `async with pool:` session is
+    active and are closed when the last one ends; outside a session a
+    connection is closed as soon as it is released, so no worker threads
+    outlive the event loop.
+    """
+
+    def __init__(self, database_path, size=4, latency_samples=1000):
+        """
+        Args:
+            database_path (str): Path to the SQLite database file
+            size (int): Number of connections (and worker threads)
+            latency_samples (int): Recent acquire latencies kept for percentiles
+        """
+        self.database_path = database_path
+        self.size = size
+        self._idle = deque()
+        self._waiters = deque()
+        self._open = 0
+        self._sessions = 0
+        self._latencies = deque(maxlen=latency_samples)
+        self._holders = {}  # checked-out connection -> task it was acquired for
+        self.metrics = {'acquired': 0, 'waited': 0, 'opened': 0, 'max_queue_depth': 0, 'interrupted': 0}
+
+    async def __aenter__(self):
+        self._sessions += 1
+        # Warm the pool on the first session
+        while self._sessions == 1 and self._open < self.size:
+            self._open += 1
+            self._idle.append(await self._connect())
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._sessions -= 1
+        if not self._sessions:
+            await self.close()
+        return False
+
+    async def _connect(self):
+        try:
+            conn = await aiosqlite.connect(self.database_path)
+        except BaseException:
+            self._open -= 1
+            raise
+        self.metrics['opened'] += 1
+        return conn
+
+    async def acquire(self, owner=None):
+        started = time.perf_counter_ns()
+        if self._idle and not self._waiters:
+            conn = self._idle.popleft()
+        elif self._open < self.size:
+            self._open += 1
+            conn = await self._connect()
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self.metrics['waited'] += 1
+            self.metrics['max_queue_depth'] = max(self.metrics['max_queue_depth'], len(self._waiters))
+            try:
+                conn = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The connection was handed over just as we were cancelled
+                    await self.release(waiter.result())
+                else:
+                    self._waiters.remove(waiter)
+                raise
+        self.metrics['acquired'] += 1
+        self._latencies.append(time.perf_counter_ns() - started)
+        self._holders[conn] = owner or asyncio.current_task()
+        return conn
+
+    async def release(self, conn):
+        self._holders.pop(conn, None)
+        if conn.in_transaction:
+            await conn.rollback()
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(conn)
+                return
+        if self._sessions:
+            self._idle.append(conn)
+        else:
+            self._open -= 1
+            await conn.close()
+
+    def connection(self):
+        """Async context manager: `async with pool.connection() as db:`."""
+        return _PooledConnection(self)
+
+    async def interrupt(self, tasks):
+        """
+        Abort the statements running on connections held by `tasks`.
+
+        Cancelling a task does not stop SQLite: the query keeps running on
+        the connection's thread, and even closing its cursor queues behind
+        it. sqlite3's interrupt() is safe to call from another thread and
+        makes the running statement fail right away, so call this before
+        cancelling tasks that may be inside a query.
+        """
+        for conn, holder in list(self._holders.items()):
+            if holder in tasks:
+                self.metrics['interrupted'] += 1
+                await conn.interrupt()
+
+    def stream(self, query, params=(), batch_size=500, max_buffered=2):
+        """Stream a query's rows: `async with pool.stream(query) as rows: async for row in rows:`."""
+        return AsyncRowStream(self, query, params, batch_size, max_buffered)
+
+    async def close(self):
+        """Close every idle connection."""
+        while self._idle:
+            self._open -= 1
+            await self._idle.popleft().close()
+
+    def stats(self):
+        """Acquire counts, queueing and latency percentiles (in ms)."""
+        samples = sorted(self._latencies)
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(len(samples) * p / 100))] / 1e6 if samples else 0.0
+
+        return dict(self.metrics, open=self._open, idle=len(self._idle), queued=len(self._waiters),
+                    acquire_p50_ms=percentile(50), acquire_p95_ms=percentile(95),
+                    acquire_max_ms=samples[-1] / 1e6 if samples else 0.0)
+
+class _PooledConnection:
+    def __init__(self, pool, owner=None):
+        self.pool = pool
+        self.owner = owner
+        self.conn = None
+
+    async def __aenter__(self):
+        self.conn = await self.pool.acquire(self.owner)
+        return self.conn
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.pool.release(self.conn)
+        return False
+
+class AsyncRowStream:
+    """
+    Async iterator over a query's rows, read in fetchmany() batches.
+
+    A background task holds a pooled connection and fetches batches into a
+    queue of at most `max_buffered` batches, so the next batch is being read
+    on the connection's thread while the caller processes the current one,
+    yet a slow consumer never causes more than that to pile up in memory.
+    It must be entered with `async with` before iterating, so an early
+    break or error closes the cursor and returns the connection; a bare
+    `async for` would leave the producer blocked on the full queue, holding
+    its connection, with nothing to stop it.
+    """
+
+    def __init__(self, pool, query, params=(), batch_size=500, max_buffered=2):
+        """
+        Args:
+            pool (AsyncConnectionPool): Pool to check the connection out of
+            query (str): SQL query to stream
+            params (tuple): Query parameters
+            batch_size (int): Rows per fetchmany() call
+            max_buffered (int): Batches fetched ahead of the consumer
+        """
+        self.pool = pool
+        self.query = query
+        self.params = params
+        self.batch_size = batch_size
+        self._queue = asyncio.Queue(maxsize=max_buffered)
+        self._batch = deque()
+        self._producer = None
+        self._owner = None
+        self._entered = False
+        self._finished = False
+        self.rows = 0
+
+    async def __aenter__(self):
+        self._entered = True
+        self._start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+        return False
+
+    def __aiter__(self):
+        if not self._entered:
+            raise RuntimeError("Iterate a row stream inside `async with pool.stream(...) as rows:` "
+                               "so leaving the loop early returns its connection")
+        return self
+
+    async def __anext__(self):
+        while not self._batch:
+            if self._finished:
+                raise StopAsyncIteration
+            batch = await self._queue.get()
+            if isinstance(batch, Exception) or not batch:
+                # Let the producer return its connection before reporting the end
+                self._finished = True
+                await self._producer
+                if batch:
+                    raise batch
+                raise StopAsyncIteration
+            self._batch.extend(batch)
+        self.rows += 1
+        return self._batch.popleft()
+
+    async def aclose(self):
+        """Stop fetching, close the cursor and return the connection."""
+        self._finished = True
+        self._batch.clear()
+        if self._producer is not None and not self._producer.done():
+            self._producer.cancel()
+            try:
+                await self._producer
+            except asyncio.CancelledError:
+                pass
+
+    def _start(self):
+        if self._producer is None:
+            # The connection is held on behalf of the consuming task, so
+            # interrupting that task also stops the producer's query
+            self._owner = asyncio.current_task()
+            self._producer = asyncio.get_running_loop().create_task(self._produce())
+
+    async def _produce(self):
+        try:
+            async with _PooledConnection(self.pool, self._owner) as db:
+                async with db.execute(self.query, self.params) as cursor:
+                    while True:
+                        batch = await cursor.fetchmany(self.batch_size)
+                        await self._queue.put(batch)
+                        if not batch:
+                            return
+        except Exception as e:
+            await self._queue.put(e)
+
+db_pool = AsyncConnectionPool('async_users.db', size=4)
+
+class QueryScheduler:
+    """
+    Runs coroutines with a concurrency limit and weighted priority classes.
+
+    At most `limit` submitted coroutines run at once; the rest wait in one
+    FIFO queue per class. When a slot frees up it goes to the waiting class
+    that has received the least service relative to its weight, so with the
+    default weights interactive queries get four slots for every batch one,
+    and a large batch fan-out can't starve them (nor can they starve batch).
+    """
+
+    def __init__(self, limit=4, weights=None):
+        """
+        Args:
+            limit (int): Maximum coroutines running at once
+            weights (dict): Share of slots per priority class
+        """
+        self.limit = limit
+        self.weights = weights or {'interactive': 4, 'batch': 1}
+        self._queues = {name: deque() for name in self.weights}
+        self._virtual_time = {name: 0.0 for name in self.weights}
+        self._clock = 0.0
+        self._running = 0
+        self.metrics = {name: {'submitted': 0, 'completed': 0, 'queue_depth': 0, 'max_queue_depth': 0,
+                               'total_wait_ms': 0.0, 'max_wait_ms': 0.0}
+                        for name in self.weights}
+
+    async def run(self, coro, priority='interactive'):
+        """Run one coroutine once a slot is granted to its priority class."""
+        if priority not in self._queues:
+            coro.close()
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {sorted(self._queues)}")
+        metrics = self.metrics[priority]
+        metrics['submitted'] += 1
+        try:
+            await self._admit(priority)
+        except BaseException:
+            coro.close()  # Cancelled while queued - it will never run
+            raise
+        try:
+            return await coro
+        finally:
+            metrics['completed'] += 1
+            self._running -= 1
+            self._dispatch()
+
+    async def gather(self, *coros, priority='interactive'):
+        """asyncio.gather() over coroutines that all go through the scheduler."""
+        return await asyncio.gather(*(self.run(coro, priority) for coro in coros))
+
+    async def _admit(self, priority):
+        if self._running < self.limit and not any(self._queues.values()):
+            self._running += 1
+            return
+        queue = self._queues[priority]
+        if not queue:
+            # A class that was idle re-enters at the current virtual time instead of catching up
+            self._virtual_time[priority] = max(self._virtual_time[priority], self._clock)
+        granted = asyncio.get_running_loop().create_future()
+        entry = (granted, time.perf_counter())
+        queue.append(entry)
+        metrics = self.metrics[priority]
+        metrics['queue_depth'] = len(queue)
+        metrics['max_queue_depth'] = max(metrics['max_queue_depth'], len(queue))
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled():
+                # The slot was granted just as we were cancelled - pass it on
+                self._running -= 1
+                self._dispatch()
+            elif entry in queue:  # _dispatch may already have dropped it
+                queue.remove(entry)
+                metrics['queue_depth'] = len(queue)
+            raise
+
+    def _dispatch(self):
+        while self._running < self.limit:
+            waiting = [name for name, queue in self._queues.items() if queue]
+            if not waiting:
+                return
+            priority = min(waiting, key=lambda name: self._virtual_time[name])
+            granted, enqueued = self._queues[priority].popleft()
+            metrics = self.metrics[priority]
+            metrics['queue_depth'] = len(self._queues[priority])
+            if granted.done():
+                continue  # Waiter was cancelled while queued
+            waited_ms = (time.perf_counter() - enqueued) * 1000
+            metrics['total_wait_ms'] += waited_ms
+            metrics['max_wait_ms'] = max(metrics['max_wait_ms'], waited_ms)
+            self._clock = self._virtual_time[priority]
+            self._virtual_time[priority] += 1 / self.weights[priority]
+            self._running += 1
+            granted.set_result(None)
+
+scheduler = QueryScheduler(limit=db_pool.size)
+
+# Answer several aggregates over the same table and filter with one scan
+class AggregationPlanner:
+    """
+    Merges the aggregates requested for one table and filter into a single
+    scan query.
+
+    Callers await aggregate('COUNT(*)'), aggregate('AVG(age)') and so on as
+    usual; every request made during the same event-loop tick is collected,
+    identical expressions are de-duplicated, and one
+    `SELECT expr1, expr2, ... FROM table WHERE filter` runs on a pooled
+    connection. Each awaiting caller then gets its own column of that row.
+    The table, filter and expressions are interpolated into the SQL, so
+    they must come from code, never from user input; values belong in params.
+    """
+
+    def __init__(self, pool, table, where=None, params=()):
+        """
+        Args:
+            pool (AsyncConnectionPool): Pool to run the merged scan on
+            table (str): Table every aggregate is computed over
+            where (str): Optional filter shared by every aggregate
+            params (tuple): Parameters for the filter's placeholders
+        """
+        self.pool = pool
+        self.table = table
+        self.where = where
+        self.params = tuple(params)
+        self._pending = {}  # normalized expression -> futures awaiting it
+        self._scans = set()
+        self.metrics = {'requested': 0, 'scans': 0}
+
+    async def aggregate(self, expression):
+        """Return the value of one aggregate expression, e.g. 'AVG(age)'."""
+        return await self._request(expression)
+
+    async def distribution(self, buckets):
+        """
+        Count rows per bucket as part of the same scan.
+
+        Args:
+            buckets (dict): Label -> SQL condition, e.g. {'Under 30': 'age < 30'}
+
+        Returns:
+            list: (label, count) pairs for non-empty buckets, sorted by label
+        """
+        counts = await asyncio.gather(*[self._request(f"COUNT(CASE WHEN {condition} THEN 1 END)")
+                                        for condition in buckets.values()])
+        return sorted((label, count) for label, count in zip(buckets, counts) if count)
+
+    def _request(self, expression):
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            # First request this tick; the others join before the flush runs
+            loop.call_soon(self._flush)
+        future = loop.create_future()
+        self._pending.setdefault(' '.join(expression.split()), []).append(future)
+        self.metrics['requested'] += 1
+        return future
+
+    def _flush(self):
+        pending, self._pending = self._pending, {}
+        scan = asyncio.get_running_loop().create_task(self._scan(pending))
+        self._scans.add(scan)
+        scan.add_done_callback(self._scans.discard)
+
+    async def _scan(self, pending):
+        expressions = list(pending)
+        query = f"SELECT {', '.join(expressions)} FROM {self.table}"
+        if self.where:
+            query += f" WHERE {self.where}"
+        try:
+            async with self.pool.connection() as db:
+                async with db.execute(query, self.params) as cursor:
+                    row = await cursor.fetchone()
+            self.metrics['scans'] += 1
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for expression, value in zip(expressions, row):
+            for future in pending[expression]:
+                if not future.done():  # Skip callers that were cancelled meanwhile
+                    future.set_result(value)
+
 # Asynchronous function to fetch all users
 async def async_fetch_users():
     """
@@ -47,33 +487,33 @@ async def async_fetch_users():
     
     Returns:
         list: All user records from the database
+    
+    Raises:
+        aiosqlite.Error: If the query fails
     """
     print(" Starting async_fetch_users...")
     start_time = datetime.now()
     
-    try:
-        # Connect to database asynchronously
-        async with aiosqlite.connect('async_users.db') as db:
-            print("🔗 Connected to database for fetching all users")
-            
-            # Execute query asynchronously
-            async with db.execute("SELECT * FROM users ORDER BY id") as cursor:
-                results = await cursor.fetchall()
-                
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
-            
-            print(f" async_fetch_users completed in {duration:.3f}s")
-            print(f" Retrieved {len(results)} total users")
-            
-            return results
-            
-    except aiosqlite.Error as e:
-        print(f" Database error in async_fetch_users: {e}")
-        return []
-    except Exception as e:
-        print(f" Unexpected error in async_fetch_users: {e}")
-        return []
+    # Stream rows from a pooled connection; each batch can be processed
+    # while the next one is still being read
+    results = []
+    first_row_time = None
+    async with db_pool.stream("SELECT * FROM users ORDER BY id") as rows:
+        print("🔗 Streaming all users from the database")
+        
+        async for row in rows:
+            if first_row_time is None:
+                first_row_time = (datetime.now() - start_time).total_seconds()
+            results.append(row)
+        
+    end_time = datetime.now()
+    duration = (end_time - start_time).total_seconds()
+    
+    print(f" async_fetch_users completed in {duration:.3f}s", end="")
+    print(f" (first row after {first_row_time:.3f}s)" if first_row_time is not None else "")
+    print(f" Retrieved {len(results)} total users")
+    
+    return results
 
 # Asynchronous function to fetch users older than 40
 async def async_fetch_older_users():
@@ -82,72 +522,183 @@ async def async_fetch_older_users():
     
     Returns:
         list: User records where age > 40
+    
+    Raises:
+        aiosqlite.Error: If the query fails
     """
     print(" Starting async_fetch_older_users...")
     start_time = datetime.now()
     
+    # Stream rows from a pooled connection; each batch can be processed
+    # while the next one is still being read
+    results = []
+    first_row_time = None
+    async with db_pool.stream("SELECT * FROM users WHERE age > ? ORDER BY age DESC", (40,)) as rows:
+        print(" Streaming older users from the database")
+        
+        async for row in rows:
+            if first_row_time is None:
+                first_row_time = (datetime.now() - start_time).total_seconds()
+            results.append(row)
+        
+    end_time = datetime.now()
+    duration = (end_time - start_time).total_seconds()
+    
+    print(f" async_fetch_older_users completed in {duration:.3f}s", end="")
+    print(f" (first row after {first_row_time:.3f}s)" if first_row_time is not None else "")
+    print(f" Retrieved {len(results)} users older than 40")
+    
+    return results
+
+# Structured concurrency: deadlines, cancellation and partial results
+class QueryResults:
+    """
+    Outcome of gather_with_deadline(): each named query either finished
+    (results), raised (errors) or ran out of time and was stopped
+    (timed_out).
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.results = {}
+        self.errors = {}
+        self.timed_out = []
+        self.elapsed = 0.0
+
+    @property
+    def complete(self):
+        """True when every query finished successfully."""
+        return len(self.results) == len(self.names)
+
+    def summary(self):
+        """One line per query: finished, failed (with the error) or timed out."""
+        lines = []
+        for name in self.names:
+            if name in self.results:
+                lines.append(f"{name}: finished")
+            elif name in self.errors:
+                lines.append(f"{name}: failed ({self.errors[name]!r})")
+            else:
+                lines.append(f"{name}: timed out")
+        return lines
+
+async def gather_with_deadline(queries, timeout=None, query_timeout=None, pool=None):
+    """
+    Run named coroutines concurrently with per-query and overall deadlines.
+
+    Unlike asyncio.gather(), one hanging query can't hold up the rest past
+    the deadline and one failing query doesn't hide the others' results.
+    A query that misses its deadline has the SQLite statement it is running
+    interrupted (see AsyncConnectionPool.interrupt) and is then cancelled,
+    so its connection comes back promptly instead of finishing the scan in
+    the background. If the caller itself is cancelled, every query is
+    stopped the same way before the cancellation propagates.
+
+    Args:
+        queries (dict): Name -> coroutine
+        timeout (float): Overall deadline in seconds for all queries
+        query_timeout (float or dict): Deadline per query, or name -> deadline
+        pool (AsyncConnectionPool): Pool the queries use; defaults to db_pool
+
+    Returns:
+        QueryResults: What finished, failed or timed out
+    """
+    pool = pool or db_pool
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    tasks = {name: loop.create_task(coro) for name, coro in queries.items()}
+    outcome = QueryResults(tasks)
+    deadlines = {}
+    for name in tasks:
+        limit = query_timeout.get(name) if isinstance(query_timeout, dict) else query_timeout
+        limits = [t for t in (limit, timeout) if t is not None]
+        deadlines[name] = started + min(limits) if limits else None
+
+    async def stop(names):
+        stopping = [tasks[name] for name in names]
+        await pool.interrupt(stopping)
+        for task in stopping:
+            task.cancel()
+        await asyncio.wait(stopping)
+
+    pending = set(tasks)
     try:
-        # Connect to database asynchronously
-        async with aiosqlite.connect('async_users.db') as db:
-            print(" Connected to database for fetching older users")
-            
-            # Execute parameterized query asynchronously
-            async with db.execute("SELECT * FROM users WHERE age > ? ORDER BY age DESC", (40,)) as cursor:
-                results = await cursor.fetchall()
-                
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
-            
-            print(f" async_fetch_older_users completed in {duration:.3f}s")
-            print(f" Retrieved {len(results)} users older than 40")
-            
-            return results
-            
-    except aiosqlite.Error as e:
-        print(f" Database error in async_fetch_older_users: {e}")
-        return []
-    except Exception as e:
-        print(f" Unexpected error in async_fetch_older_users: {e}")
-        return []
+        while pending:
+            now = loop.time()
+            expired = [name for name in pending if deadlines[name] is not None and deadlines[name] <= now]
+            if expired:
+                outcome.timed_out.extend(expired)
+                pending.difference_update(expired)
+                await stop(expired)
+                continue
+            upcoming = [deadlines[name] for name in pending if deadlines[name] is not None]
+            done, _ = await asyncio.wait([tasks[name] for name in pending],
+                                         timeout=min(upcoming) - now if upcoming else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            pending.difference_update(name for name in list(pending) if tasks[name] in done)
+    finally:
+        if pending:
+            await stop(pending)
+
+    for name, task in tasks.items():
+        if name in outcome.timed_out or task.cancelled():
+            continue
+        if task.exception() is not None:
+            outcome.errors[name] = task.exception()
+        else:
+            outcome.results[name] = task.result()
+    outcome.elapsed = loop.time() - started
+    return outcome
 
 # Main concurrent execution function
-async def fetch_concurrently():
+async def fetch_concurrently(timeout=5.0, query_timeout=2.0):
     """
-    Execute both async functions concurrently using asyncio.gather()
+    Execute both async functions concurrently, each within a deadline
+    
+    Args:
+        timeout (float): Overall deadline in seconds
+        query_timeout (float): Deadline for each query in seconds
     
     Returns:
-        tuple: Results from both async functions
+        tuple: Results from both async functions; a query that failed or
+        missed its deadline gives None instead of a list
     """
     print("\n Starting concurrent database operations...")
     print("=" * 60)
     
-    overall_start = datetime.now()
+    # Execute both queries concurrently as interactive work through the
+    # scheduler, sharing warm pooled connections; neither can run past its deadline
+    async with db_pool:
+        outcome = await gather_with_deadline({
+            'all_users': scheduler.run(async_fetch_users()),
+            'older_users': scheduler.run(async_fetch_older_users()),
+        }, timeout=timeout, query_timeout=query_timeout)
     
-    try:
-        # Execute both queries concurrently using asyncio.gather()
-        all_users, older_users = await asyncio.gather(
-            async_fetch_users(),
-            async_fetch_older_users()
-        )
-        
-        overall_end = datetime.now()
-        total_duration = (overall_end - overall_start).total_seconds()
-        
-        print("=" * 60)
-        print(f" Both operations completed concurrently in {total_duration:.3f}s")
-        
-        # Display results
-        print(f"\n RESULTS SUMMARY:")
-        print(f" Total users found: {len(all_users)}")
-        print(f" Users over 40: {len(older_users)}")
-        
-        # Display all users
+    print("=" * 60)
+    if outcome.complete:
+        print(f" Both operations completed concurrently in {outcome.elapsed:.3f}s")
+    else:
+        print(f" Partial results after {outcome.elapsed:.3f}s:")
+        for line in outcome.summary():
+            print(f"   {line}")
+    
+    all_users = outcome.results.get('all_users')
+    older_users = outcome.results.get('older_users')
+    
+    # Display results
+    print(f"\n RESULTS SUMMARY:")
+    print(f" Total users found: {len(all_users) if all_users is not None else 'unavailable'}")
+    print(f" Users over 40: {len(older_users) if older_users is not None else 'unavailable'}")
+    
+    # Display all users
+    if all_users is not None:
         print(f"\n ALL USERS ({len(all_users)} records):")
         print("-" * 70)
         for user_id, name, email, age in all_users:
             print(f"ID: {user_id:2d} | Name: {name:<15} | Email: {email:<20} | Age: {age:2d}")
-        
-        # Display older users
+    
+    # Display older users
+    if older_users is not None:
         print(f"\n USERS OLDER THAN 40 ({len(older_users)} records):")
         print("-" * 70)
         if older_users:
@@ -155,53 +706,161 @@ async def fetch_concurrently():
                 print(f"ID: {user_id:2d} | Name: {name:<15} | Email: {email:<20} | Age: {age:2d}")
         else:
             print("No users found older than 40")
-        
-        return all_users, older_users
-        
-    except Exception as e:
-        print(f" Error during concurrent execution: {e}")
-        return [], []
+    
+    return all_users, older_users
+
+# Benchmark harness for the async layer
+def setup_benchmark_database(database_path, size):
+    """
+    Create (or reuse) a users database with exactly `size` rows.
+
+    Ages cycle deterministically through 18-65, so every run of a given
+    size sees the same data and the same number of users over 40.
+    """
+    with sqlite3.connect(database_path) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                age INTEGER NOT NULL
+            )
+        ''')
+        if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] != size:
+            conn.execute("DELETE FROM users")
+            conn.executemany(
+                'INSERT INTO users (id, name, email, age) VALUES (?, ?, ?, ?)',
+                ((i, f'User {i}', f'user{i}@example.com', 18 + i * 7 % 48) for i in range(1, size + 1))
+            )
+    return database_path
+
+def summarize_samples(samples_ns, confidence=0.95):
+    """
+    Summary statistics for timing samples, reported in milliseconds.
+
+    The confidence interval for the mean uses the normal approximation,
+    which is reasonable from about 30 repetitions upward.
+    """
+    samples = sorted(samples_ns)
+    count = len(samples)
+
+    def percentile(p):
+        # Linear interpolation between closest ranks
+        rank = (count - 1) * p / 100
+        lower = int(rank)
+        upper = min(lower + 1, count - 1)
+        return samples[lower] + (samples[upper] - samples[lower]) * (rank - lower)
+
+    mean = statistics.fmean(samples)
+    stdev = statistics.stdev(samples) if count > 1 else 0.0
+    margin = statistics.NormalDist().inv_cdf((1 + confidence) / 2) * stdev / count ** 0.5
+    return {
+        'n': count,
+        'mean_ms': mean / 1e6,
+        'stdev_ms': stdev / 1e6,
+        'ci_low_ms': (mean - margin) / 1e6,
+        'ci_high_ms': (mean + margin) / 1e6,
+        'p50_ms': percentile(50) / 1e6,
+        'p95_ms': percentile(95) / 1e6,
+        'p99_ms': percentile(99) / 1e6,
+        'min_ms': samples[0] / 1e6,
+        'max_ms': samples[-1] / 1e6,
+    }
+
+async def benchmark_async(scenarios, sizes=(1000, 10000), warmup=5, repetitions=30, pool_size=4,
+                          confidence=0.95, directory=None):
+    """
+    Time async scenarios against databases of several sizes.
+
+    Each scenario is a coroutine function taking an AsyncConnectionPool.
+    For every dataset size the scenarios run `warmup` untimed rounds, then
+    `repetitions` timed rounds measured with perf_counter_ns(). Scenarios are
+    interleaved within each round (in rotating order) so that drift in
+    machine load affects all of them alike rather than biasing whichever
+    happened to run last.
+
+    Args:
+        scenarios (dict): Name -> async callable(pool)
+        sizes (tuple): Number of users in each benchmark database
+        warmup (int): Untimed rounds per size
+        repetitions (int): Timed rounds per size
+        pool_size (int): Connections in each benchmark pool
+        confidence (float): Confidence level for the mean intervals
+        directory (str): Where to keep the benchmark databases
+            (async_users_bench_<size>.db); by default a temporary
+            directory removed afterwards
+
+    Returns:
+        dict: size -> scenario name -> summary from summarize_samples()
+    """
+    names = list(scenarios)
+    results = {}
+    with nullcontext(directory) if directory else tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            database_path = os.path.join(directory, f'async_users_bench_{size}.db')
+            pool = AsyncConnectionPool(setup_benchmark_database(database_path, size), size=pool_size)
+            samples = {name: [] for name in names}
+            async with pool:
+                for round_number in range(warmup + repetitions):
+                    shift = round_number % len(names)
+                    for name in names[shift:] + names[:shift]:
+                        started = time.perf_counter_ns()
+                        await scenarios[name](pool)
+                        elapsed = time.perf_counter_ns() - started
+                        if round_number >= warmup:
+                            samples[name].append(elapsed)
+            results[size] = {name: summarize_samples(samples[name], confidence) for name in names}
+    return results
+
+def print_benchmark(results, confidence=0.95):
+    """Print one table per dataset size and compare each scenario with the first."""
+    for size, summaries in results.items():
+        print(f"\n {size} users ({next(iter(summaries.values()))['n']} repetitions, "
+              f"{confidence:.0%} CI of the mean)")
+        print(f"   {'scenario':<12} {'mean':>9} {'CI':>21} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for name, summary in summaries.items():
+            print(f"   {name:<12} {summary['mean_ms']:8.3f}ms "
+                  f"[{summary['ci_low_ms']:8.3f}, {summary['ci_high_ms']:8.3f}]ms "
+                  f"{summary['p50_ms']:8.3f}ms {summary['p95_ms']:8.3f}ms {summary['p99_ms']:8.3f}ms")
+        baseline_name, baseline = next(iter(summaries.items()))
+        for name, summary in list(summaries.items())[1:]:
+            if summary['ci_high_ms'] < baseline['ci_low_ms'] or summary['ci_low_ms'] > baseline['ci_high_ms']:
+                change = (baseline['mean_ms'] - summary['mean_ms']) / baseline['mean_ms'] * 100
+                print(f"   {name} vs {baseline_name}: {abs(change):.1f}% {'faster' if change > 0 else 'slower'}")
+            else:
+                print(f"   {name} vs {baseline_name}: intervals overlap, difference not established")
 
 # Additional demonstration: Show timing comparison
-async def demonstrate_timing_benefits():
+async def demonstrate_timing_benefits(sizes=(10, 10000), warmup=5, repetitions=30):
     """
-    Demonstrate the performance benefits of concurrent execution
+    Demonstrate the performance benefits of concurrent execution, measured
+    over many repetitions rather than a single run of each
     """
     print("\n" + "=" * 60)
     print(" TIMING COMPARISON: Sequential vs Concurrent")
     print("=" * 60)
     
-    # Sequential execution
-    print("\nSEQUENTIAL EXECUTION:")
-    sequential_start = datetime.now()
-    
-    users_sequential = await async_fetch_users()
-    older_users_sequential = await async_fetch_older_users()
-    
-    sequential_end = datetime.now()
-    sequential_time = (sequential_end - sequential_start).total_seconds()
-    print(f" Sequential execution total time: {sequential_time:.3f}s")
-    
-    # Small delay to separate the tests
-    await asyncio.sleep(0.1)
+    async def fetch_all(pool):
+        async with pool.connection() as db:
+            async with db.execute("SELECT * FROM users ORDER BY id") as cursor:
+                return await cursor.fetchall()
     
-    # Concurrent execution
-    print("\n CONCURRENT EXECUTION:")
-    concurrent_start = datetime.now()
+    async def fetch_older(pool):
+        async with pool.connection() as db:
+            async with db.execute("SELECT * FROM users WHERE age > ? ORDER BY age DESC", (40,)) as cursor:
+                return await cursor.fetchall()
     
-    users_concurrent, older_users_concurrent = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users()
-    )
+    async def sequential(pool):
+        await fetch_all(pool)
+        await fetch_older(pool)
     
-    concurrent_end = datetime.now()
-    concurrent_time = (concurrent_end - concurrent_start).total_seconds()
-    print(f"Concurrent execution total time: {concurrent_time:.3f}s")
+    async def concurrent(pool):
+        await asyncio.gather(fetch_all(pool), fetch_older(pool))
     
-    # Calculate improvement
-    if sequential_time > 0:
-        improvement = ((sequential_time - concurrent_time) / sequential_time) * 100
-        print(f"\n Performance improvement: {improvement:.1f}% faster with concurrent execution")
+    results = await benchmark_async({'sequential': sequential, 'concurrent': concurrent},
+                                    sizes=sizes, warmup=warmup, repetitions=repetitions)
+    print_benchmark(results)
+    return results
 
 # Example of more complex concurrent operations
 async def complex_concurrent_operations():
@@ -212,40 +871,30 @@ async def complex_concurrent_operations():
     print("🔧 ADVANCED: Complex Concurrent Operations")
     print("=" * 60)
     
+    # All three requests go to one planner, which runs them as a single scan
+    planner = AggregationPlanner(db_pool, 'users')
+    
     async def get_user_count():
-        async with aiosqlite.connect('async_users.db') as db:
-            async with db.execute("SELECT COUNT(*) FROM users") as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else 0
+        return await planner.aggregate("COUNT(*)") or 0
     
     async def get_average_age():
-        async with aiosqlite.connect('async_users.db') as db:
-            async with db.execute("SELECT AVG(age) FROM users") as cursor:
-                result = await cursor.fetchone()
-                return round(result[0], 2) if result and result[0] else 0
+        result = await planner.aggregate("AVG(age)")
+        return round(result, 2) if result else 0
     
     async def get_age_distribution():
-        async with aiosqlite.connect('async_users.db') as db:
-            async with db.execute("""
-                SELECT 
-                    CASE 
-                        WHEN age < 30 THEN 'Under 30'
-                        WHEN age BETWEEN 30 AND 40 THEN '30-40'
-                        ELSE 'Over 40'
-                    END as age_group,
-                    COUNT(*) as count
-                FROM users 
-                GROUP BY age_group
-            """) as cursor:
-                results = await cursor.fetchall()
-                return results
+        return await planner.distribution({
+            'Under 30': "age < 30",
+            '30-40': "age BETWEEN 30 AND 40",
+            'Over 40': "age > 40",
+        })
     
     # Execute all complex operations concurrently
-    count, avg_age, distribution = await asyncio.gather(
-        get_user_count(),
-        get_average_age(),
-        get_age_distribution()
-    )
+    async with db_pool:
+        count, avg_age, distribution = await asyncio.gather(
+            get_user_count(),
+            get_average_age(),
+            get_age_distribution()
+        )
     
     print(f" User Statistics:")
     print(f"   Total Users: {count}")
@@ -253,6 +902,177 @@ async def complex_concurrent_operations():
     print(f"   Age Distribution:")
     for age_group, group_count in distribution:
         print(f"     {age_group}: {group_count} users")
+    print(f"   ({planner.metrics['requested']} aggregates answered with {planner.metrics['scans']} scan(s))")
+
+# Fan out many queries over the fixed-size pool
+async def fan_out_queries(count=300, interactive=10):
+    """
+    Run `count` point queries at once as batch work, plus a few interactive
+    queries arriving in the middle; they share db_pool's connections instead
+    of each starting its own aiosqlite thread, and the scheduler keeps the
+    interactive ones from queueing behind the whole batch.
+    """
+    print("\n" + "=" * 60)
+    print(f" FAN-OUT: {count} concurrent queries over {db_pool.size} pooled connections")
+    print("=" * 60)
+    
+    async def fetch_user(user_id):
+        async with db_pool.connection() as db:
+            async with db.execute("SELECT * FROM users WHERE id = ?", (user_id,)) as cursor:
+                return await cursor.fetchone()
+    
+    async def interactive_lookups():
+        await asyncio.sleep(0.005)
+        return await scheduler.gather(*(fetch_user(i % 10 + 1) for i in range(interactive)))
+    
+    async with db_pool:
+        users, _ = await asyncio.gather(
+            scheduler.gather(*(fetch_user(i % 10 + 1) for i in range(count)), priority='batch'),
+            interactive_lookups()
+        )
+    
+    for priority, metrics in scheduler.metrics.items():
+        if metrics['completed']:
+            print(f" {priority:<12} completed {metrics['completed']:4d}, max queue depth "
+                  f"{metrics['max_queue_depth']:4d}, max wait {metrics['max_wait_ms']:.2f}ms")
+    stats = db_pool.stats()
+    print(f" Completed {len(users)} queries with {stats['opened']} connections opened")
+    print(f" Acquire latency p50 {stats['acquire_p50_ms']:.3f}ms, p95 {stats['acquire_p95_ms']:.3f}ms, "
+          f"max queue depth {stats['max_queue_depth']}")
+    return users
+
+# Parallel aggregation across processes over rowid ranges
+# How each aggregate kind is computed per range and how the partials merge
+MERGEABLE_AGGREGATES = {
+    'count': (lambda expr: [f"COUNT({expr})"], sum),
+    'sum': (lambda expr: [f"SUM({expr})"],
+            lambda values: sum(v for v in values if v is not None) if any(v is not None for v in values) else None),
+    'min': (lambda expr: [f"MIN({expr})"], lambda values: min((v for v in values if v is not None), default=None)),
+    'max': (lambda expr: [f"MAX({expr})"], lambda values: max((v for v in values if v is not None), default=None)),
+}
+
+def _aggregate_range(database_uri, table, columns, where, params, low, high):
+    """Run one range's partial aggregates; executed in a worker process."""
+    query = f"SELECT {', '.join(columns)} FROM {table} WHERE rowid BETWEEN ? AND ?"
+    if where:
+        query += f" AND ({where})"
+    with closing(sqlite3.connect(database_uri, uri=True)) as conn:
+        return conn.execute(query, (low, high) + tuple(params)).fetchone()
+
+def rowid_ranges(database_path, table, parts):
+    """Split the table's rowid span into at most `parts` contiguous ranges."""
+    with closing(sqlite3.connect(database_path)) as conn:
+        low, high = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+    if low is None:
+        return []
+    step = max(1, -(-(high - low + 1) // parts))
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+async def parallel_aggregate(database_path, table, aggregates, where=None, params=(), workers=None,
+                             chunks_per_worker=4, executor=None):
+    """
+    Compute aggregates over a table with one process per rowid range.
+
+    A single SQLite scan runs on one core no matter how many coroutines
+    await it. Here the table's rowid span is cut into ranges, each range is
+    aggregated in a worker process on its own read-only connection (rowid
+    lookups make each range a seek plus a partial scan), and the partial
+    results are merged: counts and sums add up, minimums and maximums
+    combine, and an average is merged from its partial sums and counts.
+    As in SQL, a sum, minimum, maximum or average over no non-NULL values
+    is None, and a sum of integers stays an integer.
+    Using several ranges per worker evens out skew between ranges.
+
+    Args:
+        database_path (str): Path to the SQLite database file
+        table (str): Table to aggregate (from code, never user input)
+        aggregates (dict): Name -> (kind, expression), kind being 'count',
+            'sum', 'min', 'max' or 'avg', e.g. {'avg_age': ('avg', 'age')}
+        where (str): Optional filter applied in every range
+        params (tuple): Parameters for the filter's placeholders
+        workers (int): Worker processes; defaults to the number of CPUs
+        chunks_per_worker (int): Ranges per worker
+        executor (ProcessPoolExecutor): Reuse an executor instead of starting one
+
+    Returns:
+        dict: Name -> merged value
+    """
+    plan = []
+    columns = []
+    for name, (kind, expr) in aggregates.items():
+        if kind == 'avg':
+            plan.append((name, kind, len(columns)))
+            columns += [f"TOTAL({expr})", f"COUNT({expr})"]
+        elif kind in MERGEABLE_AGGREGATES:
+            plan.append((name, kind, len(columns)))
+            columns += MERGEABLE_AGGREGATES[kind][0](expr)
+        else:
+            raise ValueError(f"Aggregate {name!r}: {kind!r} can't be merged across ranges, "
+                             f"expected one of {sorted(MERGEABLE_AGGREGATES) + ['avg']}")
+
+    workers = workers or os.cpu_count() or 1
+    ranges = rowid_ranges(database_path, table, workers * chunks_per_worker)
+    database_uri = Path(database_path).resolve().as_uri() + '?mode=ro'
+    loop = asyncio.get_running_loop()
+    owned = executor is None
+    executor = executor or ProcessPoolExecutor(max_workers=workers)
+    try:
+        partials = await asyncio.gather(*(
+            loop.run_in_executor(executor, _aggregate_range, database_uri, table, columns, where,
+                                 tuple(params), low, high)
+            for low, high in ranges
+        ))
+    finally:
+        if owned:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    merged = {}
+    for name, kind, index in plan:
+        if kind == 'avg':
+            total = sum(partial[index] for partial in partials)
+            count = sum(partial[index + 1] for partial in partials)
+            merged[name] = total / count if count else None
+        else:
+            merged[name] = MERGEABLE_AGGREGATES[kind][1]([partial[index] for partial in partials])
+    return merged
+
+async def parallel_aggregation_demo(size=200000, repetitions=5):
+    """
+    Compare one async scan with parallel_aggregate() on a larger table,
+    using the benchmark harness
+    """
+    print("\n" + "=" * 60)
+    print(f" PARALLEL AGGREGATION: {size} users over {os.cpu_count()} CPU(s)")
+    print("=" * 60)
+    
+    aggregates = {
+        'users': ('count', '*'),
+        'average_age': ('avg', 'age'),
+        'youngest': ('min', 'age'),
+        'oldest': ('max', 'age'),
+        'over_40': ('count', 'CASE WHEN age > 40 THEN 1 END'),
+    }
+    
+    async def single_scan(pool):
+        async with pool.connection() as db:
+            async with db.execute("SELECT COUNT(*), AVG(age), MIN(age), MAX(age), "
+                                  "COUNT(CASE WHEN age > 40 THEN 1 END) FROM users") as cursor:
+                return dict(zip(aggregates, await cursor.fetchone()))
+    
+    with ProcessPoolExecutor() as executor, tempfile.TemporaryDirectory() as directory:
+        async def parallel(pool):
+            return await parallel_aggregate(pool.database_path, 'users', aggregates, executor=executor)
+        
+        results = await benchmark_async({'single_scan': single_scan, 'parallel': parallel},
+                                        sizes=(size,), warmup=1, repetitions=repetitions,
+                                        directory=directory)
+        merged = await parallel_aggregate(os.path.join(directory, f'async_users_bench_{size}.db'),
+                                          'users', aggregates, executor=executor)
+    
+    for name, value in merged.items():
+        print(f"   {name}: {round(value, 2) if isinstance(value, float) else value}")
+    print_benchmark(results)
+    return merged
 
 # Main execution function
 def main():
@@ -271,6 +1091,8 @@ def main():
     # Additional demonstrations
     asyncio.run(demonstrate_timing_benefits())
     asyncio.run(complex_concurrent_operations())
+    asyncio.run(fan_out_queries())
+    asyncio.run(parallel_aggregation_demo())
     
     print(f"\n✨ All async operations completed successfully!")
     
@@ -281,10 +1103,10 @@ def main():
     print("# The main functions as requested:")
     print("asyncio.run(fetch_concurrently())")
     print("\n# Inside fetch_concurrently():")
-    print("all_users, older_users = await asyncio.gather(")
-    print("    async_fetch_users(),")
-    print("    async_fetch_older_users()")
-    print(")")
+    print("outcome = await gather_with_deadline({")
+    print("    'all_users': async_fetch_users(),")
+    print("    'older_users': async_fetch_older_users(),")
+    print("}, timeout=5.0, query_timeout=2.0)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
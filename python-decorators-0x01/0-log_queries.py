@@ -1,33 +1,478 @@
+import re
+import sys
+import json
+import time
+import heapq
+import atexit
+import asyncio
+import queue
+import random
+import inspect
 import sqlite3
 import functools
+import threading
 from datetime import datetime
 
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_TOKENS = re.compile(r"<=|>=|<>|!=|==|\|\||\w+|\S")
+_TIGHT_PUNCTUATION = re.compile(r" ?\. ?| [,)]|\( ")
+
+class ClosingIterator:
+    """
+    Iterator over a streamed result that runs `cleanup(failed)` exactly once:
+    when the rows run out, when the caller closes it (or leaves a `with`
+    block), or when it is garbage-collected unfinished. Only running out of
+    rows or an explicit close counts as success; a stream abandoned partway
+    and collected (e.g. its loop body raised outside a `with`) is treated as
+    failed, so a transaction around it is rolled back rather than committed.
+    """
+
+    def __init__(self, rows, cleanup):
+        self._rows = rows
+        self._cleanup = cleanup
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            return next(self._rows)
+        except StopIteration:
+            self._finish(False)
+            raise
+        except BaseException:
+            self._finish(True)
+            raise
+
+    def _finish(self, failed):
+        if not self._closed:
+            self._closed = True
+            close = getattr(self._rows, 'close', None)
+            if close is not None:
+                close()
+            self._cleanup(failed)
+
+    def close(self):
+        self._finish(False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._finish(exc_type is not None)
+        return False
+
+    def __del__(self):
+        self._finish(True)
+
+def is_stream(result):
+    """True for generator / streaming results whose resources outlive the call."""
+    return hasattr(result, '__next__') and hasattr(result, 'close')
+
+def iter_rows(cursor, batch_size=1000):
+    """Yield rows from an executed cursor, fetching `batch_size` rows at a time."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(query):
+    """
+    Reduce a query to its shape: literals become ?, whitespace (including
+    around operators and punctuation) and case are normalized, so
+    "WHERE id = 1" and "where id=2" share a fingerprint.
+    """
+    shape = ' '.join(_TOKENS.findall(_LITERALS.sub('?', query)))
+    return _TIGHT_PUNCTUATION.sub(lambda match: match.group().strip(), shape).lower()
+
+class LatencyHistogram:
+    """
+    Fixed log2 histogram of query latencies in microseconds (bucket i holds
+    durations below 2**i us), plus call, error and row counters.
+    """
+
+    BUCKETS = 32
+
+    def __init__(self):
+        self.buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, duration_ns, rows, failed):
+        bucket = min((duration_ns // 1000).bit_length(), self.BUCKETS - 1)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.errors += failed
+        self.rows += rows
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+
+    def percentile(self, p):
+        """Upper bound, in milliseconds, of the bucket holding the p-th percentile."""
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100
+        seen = 0
+        for bucket, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= target:
+                return (2 ** bucket) / 1000
+        return self.max_ns / 1e6
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'rows': self.rows,
+            'mean_ms': self.total_ns / self.count / 1e6 if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max_ns / 1e6,
+        }
+
+class QueryLog:
+    """
+    Per-fingerprint latency histograms kept in memory, plus a sampled,
+    structured (JSON lines) query log written by a background thread.
+
+    The calling thread only updates a histogram and, for sampled, slow or
+    failed queries, drops a record on a bounded queue; if the writer falls behind,
+    records are dropped and counted rather than blocking the query. Records
+    the stream fails to take (e.g. a full disk) are counted in
+    `write_errors` and the writer carries on.
+    """
+
+    def __init__(self, stream=None, sample_rate=0.01, slow_threshold_ms=100.0, max_queue=10000):
+        """
+        Args:
+            stream: File-like object the log is written to (default: stdout)
+            sample_rate (float): Fraction of queries written to the log
+            slow_threshold_ms (float): Queries slower than this (or failing) are always logged
+            max_queue (int): Records buffered for the writer before dropping
+        """
+        self.stream = stream or sys.stdout
+        self.sample_rate = sample_rate
+        self.slow_threshold_ns = slow_threshold_ms * 1e6
+        self.histograms = {}
+        self.dropped = 0
+        self.write_errors = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = threading.Thread(target=self._write_records, name='query-log-writer', daemon=True)
+        self._writer.start()
+
+    def record(self, query, duration_ns, rows, error=None):
+        key = fingerprint(query)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(duration_ns, rows, error is not None)
+        if error or duration_ns >= self.slow_threshold_ns or random.random() < self.sample_rate:
+            try:
+                self._queue.put_nowait((time.time(), key, query, duration_ns, rows, error))
+            except queue.Full:
+                self.dropped += 1
+
+    def _write_records(self):
+        while True:
+            timestamp, key, query, duration_ns, rows, error = self._queue.get()
+            try:
+                record = {
+                    'ts': datetime.fromtimestamp(timestamp).isoformat(),
+                    'fingerprint': key,
+                    'query': query,
+                    'duration_ms': round(duration_ns / 1e6, 3),
+                    'rows': rows,
+                }
+                if error:
+                    record['error'] = error
+                self.stream.write(json.dumps(record) + '\n')
+                if self._queue.empty():
+                    self.stream.flush()
+            except Exception:
+                # Keep the writer alive (and flush() returning) if the stream fails
+                self.write_errors += 1
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        self._queue.join()
+        self.stream.flush()
+
+    def stats(self, top=None):
+        """
+        Return {fingerprint: summary} ordered by total time spent, so the
+        most expensive query shapes come first.
+        """
+        with self._lock:
+            items = sorted(self.histograms.items(), key=lambda item: item[1].total_ns, reverse=True)
+            summaries = {key: histogram.summary() for key, histogram in items[:top]}
+        return summaries
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+query_log = QueryLog()
+
+@atexit.register
+def _flush_query_log():
+    # The writer is a daemon thread; write out queued records (failed and slow
+    # queries included) before the interpreter exits. Looks up the global so a
+    # log installed by configure_query_log() is the one flushed.
+    if not getattr(query_log.stream, 'closed', False):
+        query_log.flush()
+
+def configure_query_log(**options):
+    """
+    Replace the active query log (e.g. to change the sample rate or stream).
+
+    Args:
+        **options: Passed to QueryLog (stream, sample_rate, slow_threshold_ms, max_queue)
+    """
+    global query_log
+    query_log.flush()
+    query_log = QueryLog(**options)
+    return query_log
+
+class SlowQueryReport:
+    """
+    Bounded in-memory report of the slowest calls per query fingerprint,
+    each with the EXPLAIN QUERY PLAN output captured when it happened.
+
+    Keeps the `per_fingerprint` worst calls for at most `max_fingerprints`
+    fingerprints; when full, the fingerprint whose worst call is fastest
+    is dropped.
+    """
+
+    def __init__(self, per_fingerprint=5, max_fingerprints=200):
+        self.per_fingerprint = per_fingerprint
+        self.max_fingerprints = max_fingerprints
+        self.entries = {}  # fingerprint -> min-heap of (duration_ms, timestamp, query, plan, full_scan)
+        self._lock = threading.Lock()
+
+    def qualifies(self, key, duration_ms):
+        """True if a call this slow would enter the report (so its plan is worth capturing)."""
+        with self._lock:
+            worst = self.entries.get(key)
+            if worst is None:
+                return (len(self.entries) < self.max_fingerprints or
+                        duration_ms > min(heap[-1][0] for heap in self.entries.values()))
+            return len(worst) < self.per_fingerprint or duration_ms > worst[0][0]
+
+    def add(self, key, duration_ms, query, plan, full_scan):
+        entry = (duration_ms, time.time(), query, plan, full_scan)
+        with self._lock:
+            heap = self.entries.get(key)
+            if heap is None:
+                if len(self.entries) >= self.max_fingerprints:
+                    fastest = min(self.entries, key=lambda k: max(self.entries[k])[0])
+                    del self.entries[fastest]
+                heap = self.entries[key] = []
+            if len(heap) < self.per_fingerprint:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heappushpop(heap, entry)
+            # Keep the worst call last for the eviction check in qualifies()
+            heap.sort()
+
+    def report(self, top=10, full_scans_only=False):
+        """
+        Return the slowest fingerprints, worst first, each with its captured calls.
+        """
+        with self._lock:
+            rows = []
+            for key, heap in self.entries.items():
+                calls = sorted(heap, reverse=True)
+                if full_scans_only and not any(call[4] for call in calls):
+                    continue
+                rows.append({
+                    'fingerprint': key,
+                    'worst_ms': calls[0][0],
+                    'full_table_scan': any(call[4] for call in calls),
+                    'calls': [{'duration_ms': duration, 'at': datetime.fromtimestamp(at).isoformat(),
+                               'query': query, 'plan': plan, 'full_table_scan': full_scan}
+                              for duration, at, query, plan, full_scan in calls],
+                })
+        rows.sort(key=lambda row: row['worst_ms'], reverse=True)
+        return rows[:top]
+
+slow_query_report = SlowQueryReport()
+
+def explain_query_plan(conn, query, parameters=None):
+    """
+    Run EXPLAIN QUERY PLAN for a query.
+
+    Returns:
+        tuple: (list of plan detail strings, True if any step scans a whole table)
+    """
+    if parameters is None:
+        # The plan doesn't depend on the bound values, so NULLs will do
+        parameters = (None,) * query.count('?')
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", parameters).fetchall()
+    plan = [row[-1] for row in rows]
+    full_scan = any(step.startswith('SCAN ') and 'USING' not in step and 'CONSTANT ROW' not in step
+                    for step in plan)
+    return plan, full_scan
+
+def profile_queries(threshold_ms=50.0, database_path='users.db', report=None):
+    """
+    Decorator that times each call and, for calls slower than `threshold_ms`,
+    captures EXPLAIN QUERY PLAN and flags full table scans in a bounded
+    report (slow_query_report by default). A plan is only captured when the
+    call would make it into the report, so fast or repeated slow calls
+    cost one timer read.
+
+    Coroutine functions are awaited and timed, and streamed results are
+    timed until they are exhausted or closed, as in log_queries.
+
+    The query is taken from a `query` keyword or the first string argument;
+    a sqlite3 connection passed as the first argument is reused for the
+    EXPLAIN, otherwise `database_path` is opened. Bound values are read from
+    a `params` or `parameters` keyword when present.
+
+    Args:
+        threshold_ms (float): Calls slower than this are profiled
+        database_path (str): Database to EXPLAIN against without a connection argument
+        report (SlowQueryReport): Report to store results in
+    """
+    def decorator(func):
+        def finish(started, args, kwargs):
+            duration_ms = (time.perf_counter_ns() - started) / 1e6
+            if duration_ms >= threshold_ms:
+                _capture_slow_query(report or slow_query_report, duration_ms,
+                                    database_path, args, kwargs)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter_ns()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    duration_ms = (time.perf_counter_ns() - started) / 1e6
+                    if duration_ms >= threshold_ms:
+                        # EXPLAIN opens its own sqlite3 connection; keep it off the event loop
+                        await asyncio.to_thread(_capture_slow_query, report or slow_query_report,
+                                                duration_ms, database_path, args, kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter_ns()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                finish(started, args, kwargs)
+                raise
+            if is_stream(result):
+                # Time the stream until its rows are consumed or it is closed
+                return ClosingIterator(result, lambda failed: finish(started, args, kwargs))
+            finish(started, args, kwargs)
+            return result
+        return wrapper
+    return decorator
+
+def _capture_slow_query(report, duration_ms, database_path, args, kwargs):
+    query = kwargs.get('query')
+    if query is None:
+        query = next((arg for arg in args if isinstance(arg, str)), None)
+    if query is None:
+        return
+    key = fingerprint(query)
+    if not report.qualifies(key, duration_ms):
+        return
+    parameters = kwargs.get('params', kwargs.get('parameters'))
+    conn = args[0] if args and isinstance(args[0], sqlite3.Connection) else None
+    try:
+        if conn is not None:
+            plan, full_scan = explain_query_plan(conn, query, parameters)
+        else:
+            with sqlite3.connect(database_path) as explain_conn:
+                plan, full_scan = explain_query_plan(explain_conn, query, parameters)
+    except sqlite3.Error as e:
+        plan, full_scan = [f"EXPLAIN failed: {e}"], False
+    report.add(key, duration_ms, query, plan, full_scan)
+
 #### decorator to log SQL queries
 
+def _log_stream(query, started, rows):
+    """Record a streamed query once its rows are consumed, with the rows actually read."""
+    count = [0]
+
+    def counted():
+        for row in rows:
+            count[0] += 1
+            yield row
+
+    def record(failed):
+        rows.close()
+        query_log.record(query, time.perf_counter_ns() - started, count[0],
+                         "streaming failed" if failed else None)
+
+    return ClosingIterator(counted(), record)
+
 def log_queries(func):
     """
-    Decorator that logs SQL queries before executing them.
+    Decorator that logs SQL queries: times every call into a per-fingerprint
+    histogram and hands sampled or slow queries to the background log writer.
+    Streaming (generator) results are timed until fully consumed or closed.
+    Coroutine functions are awaited and timed the same way.
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Extract the query parameter from function arguments
-        query = None
-        
-        # Check for query in keyword arguments first
-        if 'query' in kwargs:
-            query = kwargs['query']
-        # Then check positional arguments (assume first argument is query)
-        elif args and len(args) > 0:
+        query = kwargs.get('query')
+        if query is None and args:
+            # Then check positional arguments (assume first argument is query)
             query = args[0]
+        if not isinstance(query, str):
+            return func(*args, **kwargs)
         
-        # Log the SQL query
-        if query:
-            print(f"[SQL LOG] Executing query: {query}")
-        else:
-            print("[SQL LOG] No query found to log")
+        # Time the original function and record the outcome
+        started = time.perf_counter_ns()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            query_log.record(query, time.perf_counter_ns() - started, 0, repr(e))
+            raise
+        if is_stream(result):
+            return _log_stream(query, started, result)
+        rows = len(result) if hasattr(result, '__len__') else 0
+        query_log.record(query, time.perf_counter_ns() - started, rows)
+        return result
+    
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query = kwargs.get('query')
+            if query is None and args:
+                query = args[0]
+            if not isinstance(query, str):
+                return await func(*args, **kwargs)
+            
+            started = time.perf_counter_ns()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                query_log.record(query, time.perf_counter_ns() - started, 0, repr(e))
+                raise
+            rows = len(result) if hasattr(result, '__len__') else 0
+            query_log.record(query, time.perf_counter_ns() - started, rows)
+            return result
         
-        # Execute the original function
-        return func(*args, **kwargs)
+        return async_wrapper
     
     return wrapper
 
@@ -40,5 +485,16 @@ def fetch_all_users(query):
     conn.close()
     return results
 
-#### fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
+@log_queries
+def stream_all_users(query, batch_size=1000):
+    conn = sqlite3.connect('users.db')
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        yield from iter_rows(cursor, batch_size)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    #### fetch users while logging the query
+    users = fetch_all_users(query="SELECT * FROM users")
\ No newline at end of file
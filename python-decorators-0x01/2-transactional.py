@@ -1,56 +1,390 @@
+import inspect
 import sqlite3 
 import functools
+import threading
+from concurrent.futures import Future
+
+class ClosingIterator:
+    """
+    Iterator over a streamed result that runs `cleanup(failed)` exactly once:
+    when the rows run out, when the caller closes it (or leaves a `with`
+    block), or when it is garbage-collected unfinished. Only running out of
+    rows or an explicit close counts as success; a stream abandoned partway
+    and collected (e.g. its loop body raised outside a `with`) is treated as
+    failed, so a transaction around it is rolled back rather than committed.
+    """
+
+    def __init__(self, rows, cleanup):
+        self._rows = rows
+        self._cleanup = cleanup
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            return next(self._rows)
+        except StopIteration:
+            self._finish(False)
+            raise
+        except BaseException:
+            self._finish(True)
+            raise
+
+    def _finish(self, failed):
+        if not self._closed:
+            self._closed = True
+            close = getattr(self._rows, 'close', None)
+            if close is not None:
+                close()
+            self._cleanup(failed)
+
+    def close(self):
+        self._finish(False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._finish(exc_type is not None)
+        return False
+
+    def __del__(self):
+        self._finish(True)
+
+def is_stream(result):
+    """True for generator / streaming results whose resources outlive the call."""
+    return hasattr(result, '__next__') and hasattr(result, 'close')
+
+def iter_rows(cursor, batch_size=1000):
+    """Yield rows from an executed cursor, fetching `batch_size` rows at a time."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
 
 def with_db_connection(func):
     """
     Decorator that automatically handles database connection lifecycle.
-    Opens a connection, passes it to the function, and ensures it's closed afterward.
+    Opens a connection, passes it to the function, and ensures it's closed afterward
+    (for streaming results, once the returned iterator is exhausted or closed).
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Open database connection
         conn = sqlite3.connect('users.db')
         
+        handed_off = False
+        
         try:
             # Call the original function with connection as first argument
             result = func(conn, *args, **kwargs)
+            if is_stream(result):
+                # Streaming result - keep the connection open until the rows are consumed
+                result = ClosingIterator(result, lambda failed: conn.close())
+                handed_off = True
             return result
         except Exception as e:
             # If there's an error, still close the connection
             print(f"Database error: {e}")
             raise
         finally:
-            # Always close the connection
-            conn.close()
+            # Always close the connection, unless a stream now owns it
+            if not handed_off:
+                conn.close()
     
     return wrapper
 
-def transactional(func):
+# Nesting depth of @transactional calls per open connection (keyed by id)
+_transaction_depth = {}
+
+def _end_transaction(conn, error):
+    """Commit (or roll back after `error`) an outermost @transactional call."""
+    del _transaction_depth[id(conn)]
+    if error:
+        conn.rollback()
+        print(f"Transaction rolled back due to error: {error}")
+    else:
+        conn.commit()
+        print("Transaction committed successfully")
+
+def _run_in_savepoint(conn, depth, func, args, kwargs):
     """
-    Decorator that wraps database operations in a transaction.
-    Commits on success, rolls back on error.
+    Run a nested @transactional call under its own SAVEPOINT, so a failure
+    rolls back only this call's writes and the enclosing transaction goes on.
     """
+    savepoint = f"transactional_{depth}"
+    conn.execute(f"SAVEPOINT {savepoint}")
+    _transaction_depth[id(conn)] = depth + 1
+
+    def finish(error):
+        _transaction_depth[id(conn)] = depth
+        if error:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+            print(f"Rolled back to savepoint {savepoint} due to error: {error}")
+        else:
+            conn.execute(f"RELEASE {savepoint}")
+
+    try:
+        result = func(conn, *args, **kwargs)
+    except BaseException as e:
+        finish(e)
+        raise
+    if is_stream(result):
+        # Keep the savepoint open until the streamed rows are consumed
+        return ClosingIterator(result, lambda failed: finish("streaming failed" if failed else None))
+    finish(None)
+    return result
+
+async def _run_in_savepoint_async(conn, depth, func, args, kwargs):
+    """Coroutine counterpart of _run_in_savepoint for aiosqlite connections."""
+    savepoint = f"transactional_{depth}"
+    await conn.execute(f"SAVEPOINT {savepoint}")
+    _transaction_depth[id(conn)] = depth + 1
+    try:
+        result = await func(conn, *args, **kwargs)
+    except Exception as e:
+        await conn.execute(f"ROLLBACK TO {savepoint}")
+        await conn.execute(f"RELEASE {savepoint}")
+        print(f"Rolled back to savepoint {savepoint} due to error: {e}")
+        raise
+    else:
+        await conn.execute(f"RELEASE {savepoint}")
+        return result
+    finally:
+        _transaction_depth[id(conn)] = depth
+
+class GroupCommitter:
+    """
+    Batches concurrent @transactional calls into one commit (group commit).
+
+    The first caller to arrive becomes the leader: it waits up to `max_wait`
+    seconds (or until `max_batch` operations are queued), then runs every
+    queued operation on its own connection inside a single transaction,
+    each one under its own SAVEPOINT, and commits once. A failing operation
+    is rolled back to its savepoint and only its caller sees the error;
+    the rest of the batch still commits. Callers arriving while a batch is
+    committing form the next batch.
+
+    If the leader's connection already has a transaction open, the batch
+    runs under a SAVEPOINT inside it instead, and committing is left to
+    whoever opened that transaction.
+    """
+
+    def __init__(self, max_batch=50, max_wait=0.005):
+        """
+        Args:
+            max_batch (int): Operations per transaction before flushing early
+            max_wait (float): Seconds the leader waits for more operations
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = []
+        self._leading = False
+        self._full = threading.Event()
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self.stats = {'batches': 0, 'operations': 0, 'failed_operations': 0, 'failed_commits': 0}
+
+    def submit(self, conn, func, args, kwargs):
+        """Queue one operation and block until its batch has committed."""
+        operation = (func, args, kwargs, Future())
+        with self._lock:
+            self._queue.append(operation)
+            if len(self._queue) >= self.max_batch:
+                self._full.set()
+            leader = not self._leading
+            self._leading = True
+        if leader:
+            self._full.wait(self.max_wait)
+            with self._lock:
+                batch, self._queue = self._queue, []
+                self._leading = False
+                self._full.clear()
+            try:
+                for start in range(0, len(batch), self.max_batch):
+                    self._run_batch(conn, batch[start:start + self.max_batch])
+            except BaseException as e:
+                # Later chunks never ran - don't leave their callers waiting
+                for func, args, kwargs, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                raise
+        return operation[3].result()
+
+    def _run_batch(self, conn, batch):
+        with self._commit_lock:
+            succeeded = []
+            owns_transaction = not conn.in_transaction
+            previous_depth = _transaction_depth.get(id(conn))
+            try:
+                if owns_transaction:
+                    conn.execute("BEGIN")
+                else:
+                    conn.execute("SAVEPOINT group_batch")
+                # Operations run at savepoint depth, so nested @transactional calls nest too
+                _transaction_depth[id(conn)] = (previous_depth or 0) + 1
+                for func, args, kwargs, future in batch:
+                    conn.execute("SAVEPOINT group_operation")
+                    try:
+                        result = func(conn, *args, **kwargs)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO group_operation")
+                        conn.execute("RELEASE group_operation")
+                        self.stats['failed_operations'] += 1
+                        future.set_exception(e)
+                    else:
+                        conn.execute("RELEASE group_operation")
+                        succeeded.append((future, result))
+                if owns_transaction:
+                    conn.commit()
+                else:
+                    conn.execute("RELEASE group_batch")
+            except BaseException as e:
+                # The batch as a whole failed - nobody's writes were kept
+                if owns_transaction:
+                    conn.rollback()
+                else:
+                    conn.execute("ROLLBACK TO group_batch")
+                    conn.execute("RELEASE group_batch")
+                self.stats['failed_commits'] += 1
+                print(f"Group commit rolled back due to error: {e}")
+                for func, args, kwargs, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                if not isinstance(e, Exception):
+                    # e.g. KeyboardInterrupt - the callers are released, now stop
+                    raise
+                return
+            finally:
+                if previous_depth is None:
+                    _transaction_depth.pop(id(conn), None)
+                else:
+                    _transaction_depth[id(conn)] = previous_depth
+            self.stats['batches'] += 1
+            self.stats['operations'] += len(batch)
+            print(f"Group commit: {len(succeeded)} of {len(batch)} operations "
+                  f"{'committed' if owns_transaction else 'applied in the open transaction'}")
+            for future, result in succeeded:
+                future.set_result(result)
+
+def _async_transactional(func):
+    """Coroutine version of @transactional for aiosqlite connections, including nesting."""
     @functools.wraps(func)
-    def wrapper(conn, *args, **kwargs):
+    async def wrapper(conn, *args, **kwargs):
+        depth = _transaction_depth.get(id(conn), 0)
+        if depth:
+            return await _run_in_savepoint_async(conn, depth, func, args, kwargs)
+        
+        _transaction_depth[id(conn)] = 1
         try:
-            # Begin transaction (SQLite auto-begins with first statement)
-            # Execute the function
-            result = func(conn, *args, **kwargs)
-            
-            # If we get here, no exception occurred - commit the transaction
-            conn.commit()
+            if not conn.in_transaction:
+                await conn.execute("BEGIN")
+            result = await func(conn, *args, **kwargs)
+            await conn.commit()
             print("Transaction committed successfully")
             return result
-            
         except Exception as e:
-            # An error occurred - rollback the transaction
-            conn.rollback()
+            await conn.rollback()
             print(f"Transaction rolled back due to error: {e}")
-            # Re-raise the exception
             raise
+        finally:
+            del _transaction_depth[id(conn)]
     
     return wrapper
 
+def transactional(func=None, *, group_commit=False, max_batch=50, max_wait=0.005, committer=None):
+    """
+    Decorator that wraps database operations in a transaction.
+    Commits on success, rolls back on error.
+
+    Nested calls on the same connection (a @transactional function calling
+    another one and passing its conn) don't commit: each inner call runs
+    under a SAVEPOINT, so its failure only undoes its own writes and the
+    outer transaction decides what is finally committed.
+
+    Coroutine functions (aiosqlite connections) are supported with the
+    same commit, rollback and savepoint behaviour, except group commit.
+
+    When the function returns a generator, the transaction stays open until
+    the stream is exhausted or closed, then commits (or rolls back if
+    iterating raised).
+
+    Used as @transactional(group_commit=True), concurrent calls are instead
+    batched into shared transactions by a GroupCommitter, trading a few
+    milliseconds of latency for one commit (and fsync) per batch. Called
+    inside another @transactional on the same connection, such a function
+    nests under a savepoint like any other.
+
+    Args:
+        group_commit (bool): Batch concurrent calls into one commit
+        max_batch (int): Operations per group commit
+        max_wait (float): Seconds to wait for a group to fill
+        committer (GroupCommitter): Share one committer between functions
+            writing to the same database (default: one per function)
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            if group_commit:
+                raise TypeError("group_commit is only supported for synchronous functions")
+            return _async_transactional(func)
+
+        if group_commit:
+            group = committer or GroupCommitter(max_batch=max_batch, max_wait=max_wait)
+
+            @functools.wraps(func)
+            def group_wrapper(conn, *args, **kwargs):
+                depth = _transaction_depth.get(id(conn), 0)
+                if depth:
+                    # Called inside another @transactional on this connection - nest
+                    # under a savepoint rather than committing the caller's transaction
+                    return _run_in_savepoint(conn, depth, func, args, kwargs)
+                return group.submit(conn, func, args, kwargs)
+
+            group_wrapper.committer = group
+            return group_wrapper
+
+        @functools.wraps(func)
+        def wrapper(conn, *args, **kwargs):
+            depth = _transaction_depth.get(id(conn), 0)
+            if depth:
+                # Already inside a transaction on this connection - use a savepoint
+                return _run_in_savepoint(conn, depth, func, args, kwargs)
+            
+            _transaction_depth[id(conn)] = 1
+            try:
+                # Begin explicitly so savepoints opened by nested calls stay
+                # part of this transaction instead of committing on release
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                # Execute the function
+                result = func(conn, *args, **kwargs)
+            except BaseException as e:
+                # An error occurred - rollback the transaction
+                _end_transaction(conn, e)
+                # Re-raise the exception
+                raise
+            
+            if is_stream(result):
+                # Streaming result - commit once the rows are consumed, roll back if streaming fails
+                return ClosingIterator(result, lambda failed: _end_transaction(
+                    conn, "streaming failed" if failed else None))
+            
+            # If we get here, no exception occurred - commit the transaction
+            _end_transaction(conn, None)
+            return result
+        
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
 @with_db_connection 
 @transactional 
 def update_user_email(conn, user_id, new_email): 
@@ -58,5 +392,6 @@ def update_user_email(conn, user_id, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id)) 
     print(f"Updated user {user_id} email to {new_email}")
 
-#### Update user's email with automatic transaction handling 
-update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
\ No newline at end of file
+if __name__ == "__main__":
+    #### Update user's email with automatic transaction handling 
+    update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
\ No newline at end of file
@@ -1,49 +1,273 @@
 import time
+import random
+import asyncio
+import inspect
 import sqlite3 
+import itertools
 import functools
+import threading
+from collections import deque
+
+class ClosingIterator:
+    """
+    Iterator over a streamed result that runs `cleanup(failed)` exactly once:
+    when the rows run out, when the caller closes it (or leaves a `with`
+    block), or when it is garbage-collected unfinished. Only running out of
+    rows or an explicit close counts as success; a stream abandoned partway
+    and collected (e.g. its loop body raised outside a `with`) is treated as
+    failed, so a transaction around it is rolled back rather than committed.
+    """
+
+    def __init__(self, rows, cleanup):
+        self._rows = rows
+        self._cleanup = cleanup
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            return next(self._rows)
+        except StopIteration:
+            self._finish(False)
+            raise
+        except BaseException:
+            self._finish(True)
+            raise
+
+    def _finish(self, failed):
+        if not self._closed:
+            self._closed = True
+            close = getattr(self._rows, 'close', None)
+            if close is not None:
+                close()
+            self._cleanup(failed)
+
+    def close(self):
+        self._finish(False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._finish(exc_type is not None)
+        return False
+
+    def __del__(self):
+        self._finish(True)
+
+def is_stream(result):
+    """True for generator / streaming results whose resources outlive the call."""
+    return hasattr(result, '__next__') and hasattr(result, 'close')
+
+def iter_rows(cursor, batch_size=1000):
+    """Yield rows from an executed cursor, fetching `batch_size` rows at a time."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
 
 def with_db_connection(func):
     """
     Decorator that automatically handles database connection lifecycle.
-    Opens a connection, passes it to the function, and ensures it's closed afterward.
+    Opens a connection, passes it to the function, and ensures it's closed afterward
+    (for streaming results, once the returned iterator is exhausted or closed).
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Open database connection
         conn = sqlite3.connect('users.db')
         
+        handed_off = False
+        
         try:
             # Call the original function with connection as first argument
             result = func(conn, *args, **kwargs)
+            if is_stream(result):
+                # Streaming result - keep the connection open until the rows are consumed
+                result = ClosingIterator(result, lambda failed: conn.close())
+                handed_off = True
             return result
         except Exception as e:
             # If there's an error, still close the connection
             print(f"Database error: {e}")
             raise
         finally:
-            # Always close the connection
-            conn.close()
+            # Always close the connection, unless a stream now owns it
+            if not handed_off:
+                conn.close()
     
     return wrapper
 
-def retry_on_failure(retries=3, delay=2):
+def prime_stream(rows):
+    """
+    Pull the first row of a stream so that starting it (running the query)
+    happens now, then return an iterator over all of its rows.
+    """
+    try:
+        first = next(rows)
+    except StopIteration:
+        return ClosingIterator(iter(()), lambda failed: rows.close())
+    return ClosingIterator(itertools.chain((first,), rows), lambda failed: rows.close())
+
+# Error messages SQLite uses for conditions that usually clear up on their own
+TRANSIENT_SQLITE_ERRORS = ('database is locked', 'database table is locked', 'database is busy',
+                           'disk i/o error', 'unable to open database file')
+
+def is_transient(error):
+    """
+    Return True if an error is worth retrying.
+
+    Lock contention and I/O hiccups are transient; syntax errors, missing
+    tables, constraint violations and programming errors are not.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(text in message for text in TRANSIENT_SQLITE_ERRORS)
+    return False
+
+class RetryBudget:
+    """
+    Process-wide cap on retries, shared by every retry_on_failure function.
+
+    Each call deposits `ratio` tokens and each retry spends one, so retries
+    can add at most `ratio` extra load on top of normal traffic; a small
+    `min_per_second` allowance keeps retries possible at low traffic. When
+    the backend is down the budget drains and callers fail fast instead of
+    multiplying the load with retry storms.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, max_tokens=100.0):
+        """
+        Args:
+            ratio (float): Retries allowed per call made
+            min_per_second (float): Retries allowed per second regardless of traffic
+            max_tokens (float): Maximum retries that can be saved up
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.exhausted = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount):
+        now = time.monotonic()
+        amount += (now - self._updated) * self.min_per_second
+        self._updated = now
+        self.tokens = min(self.max_tokens, self.tokens + amount)
+
+    def deposit(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            self._refill(0.0)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+retry_budget = RetryBudget()
+
+def _backoff_delay(error, attempt, retries, delay, max_delay, give_up_at, retry_tokens, retry_if):
+    """Return how long to sleep before the next attempt, or None to give up."""
+    # Permanent errors are raised straight away
+    if not retry_if(error):
+        return None
+    
+    # If this was the last attempt, don't retry
+    if attempt == retries:
+        print(f"Function failed after {retries + 1} attempts. Final error: {error}")
+        return None
+    
+    # Full jitter: sleep a random time up to the exponential backoff
+    sleep_for = random.uniform(0, min(max_delay, delay * 2 ** attempt))
+    if give_up_at is not None:
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            print(f" Attempt {attempt + 1} failed: {error}; deadline reached, not retrying")
+            return None
+        sleep_for = min(sleep_for, remaining)
+    if not retry_tokens.try_spend():
+        print(f" Attempt {attempt + 1} failed: {error}; retry budget exhausted, not retrying")
+        return None
+    
+    # Log the failure and prepare to retry
+    print(f" Attempt {attempt + 1} failed: {error}")
+    print(f" Retrying in {sleep_for:.2f} seconds... (attempt {attempt + 2} of {retries + 1})")
+    return sleep_for
+
+def retry_on_failure(retries=3, delay=2, max_delay=30, deadline=None, retry_if=is_transient, budget=None):
     """
-    Decorator that retries a function a certain number of times if it raises an exception.
+    Decorator that retries a function a certain number of times if it raises
+    a transient exception, with exponential backoff and full jitter.
     
     Args:
         retries (int): Maximum number of retry attempts (default: 3)
-        delay (int): Delay in seconds between retries (default: 2)
+        delay (float): Base delay in seconds; attempt n sleeps up to delay * 2**n (default: 2)
+        max_delay (float): Upper bound for a single sleep in seconds (default: 30)
+        deadline (float): Total seconds a call may spend including retries (default: no limit)
+        retry_if (callable): Decides whether an exception is worth retrying (default: is_transient)
+        budget (RetryBudget): Retry budget to draw from (default: the process-wide retry_budget)
+
+    Generator (streaming) functions are retried until their first row is
+    produced; errors after that are raised to the caller.
+
+    Coroutine functions are retried with asyncio.sleep, so waiting for the
+    next attempt doesn't block the event loop.
     """
     def decorator(func):
+        def backoff(error, attempt, give_up_at, retry_tokens):
+            return _backoff_delay(error, attempt, retries, delay, max_delay, give_up_at,
+                                  retry_tokens, retry_if)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                retry_tokens = budget or retry_budget
+                retry_tokens.deposit()
+                give_up_at = time.monotonic() + deadline if deadline is not None else None
+                
+                for attempt in range(retries + 1):
+                    try:
+                        result = await func(*args, **kwargs)
+                        if attempt > 0:
+                            print(f"Function succeeded on attempt {attempt + 1}")
+                        return result
+                    except Exception as e:
+                        sleep_for = backoff(e, attempt, give_up_at, retry_tokens)
+                        if sleep_for is None:
+                            raise
+                        # Non-blocking wait so other tasks keep running
+                        await asyncio.sleep(sleep_for)
+            
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
+            retry_tokens = budget or retry_budget
+            retry_tokens.deposit()
+            give_up_at = time.monotonic() + deadline if deadline is not None else None
             
             # Try the function up to (retries + 1) times (original attempt + retries)
             for attempt in range(retries + 1):
                 try:
                     # Attempt to execute the function
                     result = func(*args, **kwargs)
+                    if is_stream(result):
+                        # Run the query inside the retry loop; once rows have
+                        # been handed out a failing stream can't be replayed
+                        result = prime_stream(result)
                     
                     # If successful and this wasn't the first attempt, log success
                     if attempt > 0:
@@ -52,27 +276,159 @@ def retry_on_failure(retries=3, delay=2):
                     return result
                     
                 except Exception as e:
-                    last_exception = e
-                    
-                    # If this was the last attempt, don't retry
-                    if attempt == retries:
-                        print(f"Function failed after {retries + 1} attempts. Final error: {e}")
-                        raise e
-                    
-                    # Log the failure and prepare to retry
-                    print(f" Attempt {attempt + 1} failed: {e}")
-                    print(f" Retrying in {delay} seconds... (attempt {attempt + 2} of {retries + 1})")
+                    sleep_for = backoff(e, attempt, give_up_at, retry_tokens)
+                    if sleep_for is None:
+                        raise
                     
                     # Wait before retrying
-                    time.sleep(delay)
-            
-            # This should never be reached, but just in case
-            if last_exception:
-                raise last_exception
+                    time.sleep(sleep_for)
         
         return wrapper
     return decorator
 
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while a circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Tracks recent outcomes of calls to one backend and stops calling it
+    while it is failing.
+
+    closed    - calls go through; outcomes of the last `window` calls are kept
+    open      - once at least `min_calls` were seen and the failure rate
+                reaches `failure_threshold`, calls fail fast with
+                CircuitOpenError for `reset_timeout` seconds
+    half-open - then up to `half_open_calls` trial calls are let through;
+                if they all succeed the breaker closes, any failure reopens it
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold=0.5, window=20, min_calls=5, reset_timeout=30.0,
+                 half_open_calls=1, is_failure=is_transient):
+        """
+        Args:
+            failure_threshold (float): Failure rate in the window that opens the circuit
+            window (int): Number of recent calls the failure rate is computed over
+            min_calls (int): Calls needed in the window before the circuit can open
+            reset_timeout (float): Seconds to stay open before trying half-open
+            half_open_calls (int): Trial calls allowed while half-open
+            is_failure (callable): Which exceptions count as backend failures
+        """
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.is_failure = is_failure
+        self.state = self.CLOSED
+        self.outcomes = deque(maxlen=window)  # True for a failed call
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.outcomes.clear()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit open, retry in "
+                                           f"{self.reset_timeout - (time.monotonic() - self._opened_at):.1f}s")
+                self.state = self.HALF_OPEN
+                self._trials = self._trial_successes = 0
+            if self.state == self.HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError("Circuit half-open, trial calls in progress")
+                self._trials += 1
+
+    def record(self, failed):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if failed:
+                    self._open()
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self.state = self.CLOSED
+                return
+            self.outcomes.append(failed)
+            failures = sum(self.outcomes)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.failure_threshold:
+                self._open()
+
+    def release(self):
+        """
+        Give back a call's trial slot without recording an outcome, for calls
+        that ended without a verdict (cancelled, KeyboardInterrupt, ...).
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def stats(self):
+        with self._lock:
+            return {'state': self.state, 'window_calls': len(self.outcomes),
+                    'window_failures': sum(self.outcomes), 'rejected': self.rejected}
+
+def circuit_breaker(breaker=None, **options):
+    """
+    Decorator that fails fast with CircuitOpenError while the backend is failing.
+
+    Place it outermost, above with_db_connection and retry_on_failure, so an
+    open circuit skips both the connection checkout and the retry cycle;
+    CircuitOpenError is never retried. Functions hitting the same backend
+    can share one breaker by passing it in.
+    
+    Args:
+        breaker (CircuitBreaker): Breaker to use (default: a new one per function)
+        **options: Passed to CircuitBreaker when creating a new one
+    """
+    def decorator(func):
+        state = breaker or CircuitBreaker(**options)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                state.before_call()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    state.record(state.is_failure(e))
+                    raise
+                except BaseException:
+                    state.release()
+                    raise
+                state.record(False)
+                return result
+
+            async_wrapper.breaker = state
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            state.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                state.record(state.is_failure(e))
+                raise
+            except BaseException:
+                state.release()
+                raise
+            state.record(False)
+            return result
+
+        wrapper.breaker = state
+        return wrapper
+    return decorator
+
 @with_db_connection
 @retry_on_failure(retries=3, delay=1)
 def fetch_users_with_retry(conn):
@@ -80,6 +436,22 @@ def fetch_users_with_retry(conn):
     cursor.execute("SELECT * FROM users")
     return cursor.fetchall()
 
-#### attempt to fetch users with automatic retry on failure
-users = fetch_users_with_retry()
-print(users)
\ No newline at end of file
+@with_db_connection
+@retry_on_failure(retries=3, delay=1)
+def stream_users_with_retry(conn, batch_size=1000):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users")
+    yield from iter_rows(cursor, batch_size)
+
+@circuit_breaker(failure_threshold=0.5, window=20, reset_timeout=30)
+@with_db_connection
+@retry_on_failure(retries=3, delay=1)
+def fetch_users_guarded(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users")
+    return cursor.fetchall()
+
+if __name__ == "__main__":
+    #### attempt to fetch users with automatic retry on failure
+    users = fetch_users_with_retry()
+    print(users)
\ No newline at end of file
@@ -1,38 +1,509 @@
+import os
 import time
+import zlib
+import asyncio
+import inspect
+import fcntl
+import pickle
+import struct
 import sqlite3 
+import hashlib
+import tempfile
 import functools
+from array import array
+from collections.abc import Sequence
+from multiprocessing import shared_memory, resource_tracker
+
+class ClosingIterator:
+    """
+    Iterator over a streamed result that runs `cleanup(failed)` exactly once:
+    when the rows run out, when the caller closes it (or leaves a `with`
+    block), or when it is garbage-collected unfinished. Only running out of
+    rows or an explicit close counts as success; a stream abandoned partway
+    and collected (e.g. its loop body raised outside a `with`) is treated as
+    failed, so a transaction around it is rolled back rather than committed.
+    """
+
+    def __init__(self, rows, cleanup):
+        self._rows = rows
+        self._cleanup = cleanup
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            return next(self._rows)
+        except StopIteration:
+            self._finish(False)
+            raise
+        except BaseException:
+            self._finish(True)
+            raise
+
+    def _finish(self, failed):
+        if not self._closed:
+            self._closed = True
+            close = getattr(self._rows, 'close', None)
+            if close is not None:
+                close()
+            self._cleanup(failed)
+
+    def close(self):
+        self._finish(False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._finish(exc_type is not None)
+        return False
+
+    def __del__(self):
+        self._finish(True)
+
+def is_stream(result):
+    """True for generator / streaming results whose resources outlive the call."""
+    return hasattr(result, '__next__') and hasattr(result, 'close')
+
+def iter_rows(cursor, batch_size=1000):
+    """Yield rows from an executed cursor, fetching `batch_size` rows at a time."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
 
 def with_db_connection(func):
     """
     Decorator that automatically handles database connection lifecycle.
-    Opens a connection, passes it to the function, and ensures it's closed afterward.
+    Opens a connection, passes it to the function, and ensures it's closed afterward
+    (for streaming results, once the returned iterator is exhausted or closed).
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Open database connection
         conn = sqlite3.connect('users.db')
         
+        handed_off = False
+        
         try:
             # Call the original function with connection as first argument
             result = func(conn, *args, **kwargs)
+            if is_stream(result):
+                # Streaming result - keep the connection open until the rows are consumed
+                result = ClosingIterator(result, lambda failed: conn.close())
+                handed_off = True
             return result
         except Exception as e:
             # If there's an error, still close the connection
             print(f"Database error: {e}")
             raise
         finally:
-            # Always close the connection
-            conn.close()
+            # Always close the connection, unless a stream now owns it
+            if not handed_off:
+                conn.close()
     
     return wrapper
 
+class CompactResult(Sequence):
+    """
+    Read-only, column-packed copy of a result set (a list of row tuples).
+
+    Integer and float columns are stored as packed 64-bit arrays, text and
+    blob columns as an offsets array plus one byte buffer, and anything else
+    (NULLs, mixed types) is pickled per column. All columns share a single
+    buffer that can optionally be zlib-compressed. Nothing is decoded until
+    the result is accessed, and then only the requested rows are built from
+    zero-copy memoryviews over that buffer.
+
+    It behaves as a read-only sequence of row tuples (len, indexing, slices,
+    iteration, `+` with a list, a list-like repr); use list(result) where a
+    real list is needed, e.g. for json.dumps().
+
+    A compressed result is decompressed on each access and the decoded
+    buffer is not kept, so it stays small after it has been read: iterate
+    or slice it rather than indexing row by row.
+    """
+
+    def __init__(self, rows, compress=False):
+        """
+        Pack a result set.
+
+        Args:
+            rows (list): Rows as returned by cursor.fetchall()
+            compress (bool): zlib-compress the packed buffer
+        """
+        rows = list(rows)
+        self.row_count = len(rows)
+        columns = list(zip(*rows)) if rows else []
+        self.columns = []  # (kind, start, length) per column
+        chunks, position = [], 0
+        for values in columns:
+            kind, chunk = self._pack_column(values)
+            self.columns.append((kind, position, len(chunk)))
+            chunks.append(chunk)
+            position += len(chunk)
+        data = b''.join(chunks)
+        self.compressed = compress and len(data) > 0
+        self.data = zlib.compress(data) if self.compressed else data
+        self._views = None
+
+    @staticmethod
+    def _pack_column(values):
+        types = {type(value) for value in values}
+        if types == {int} and all(-2**63 <= value < 2**63 for value in values):
+            return 'q', array('q', values).tobytes()
+        if types == {float}:
+            return 'd', array('d', values).tobytes()
+        if types == {str} or types == {bytes}:
+            encoded = [value.encode() for value in values] if types == {str} else list(values)
+            offsets = array('q', [0])
+            for item in encoded:
+                offsets.append(offsets[-1] + len(item))
+            kind = 's' if types == {str} else 'b'
+            return kind, offsets.tobytes() + b''.join(encoded)
+        return 'o', pickle.dumps(list(values), protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _column_views(self):
+        """Decode the buffer into per-column accessors (kept only when uncompressed)."""
+        views = self._views
+        if views is None:
+            data = memoryview(zlib.decompress(self.data) if self.compressed else self.data)
+            views = []
+            for kind, start, length in self.columns:
+                view = data[start:start + length]
+                if kind in ('q', 'd'):
+                    views.append((kind, view.cast(kind), None))
+                elif kind in ('s', 'b'):
+                    size = (self.row_count + 1) * 8
+                    views.append((kind, view[:size].cast('q'), view[size:]))
+                else:
+                    views.append((kind, pickle.loads(view), None))
+            if not self.compressed:
+                # Views over the stored buffer cost nothing to keep
+                self._views = views
+        return views
+
+    def _value(self, column, index):
+        kind, values, blob = column
+        if kind in ('s', 'b'):
+            item = blob[values[index]:values[index + 1]]
+            return str(item, 'utf-8') if kind == 's' else bytes(item)
+        return values[index]
+
+    def column(self, index):
+        """Return a whole column; numeric columns come back as zero-copy views."""
+        kind, values, blob = self._column_views()[index]
+        if kind in ('q', 'd', 'o'):
+            return values
+        return [self._value((kind, values, blob), i) for i in range(self.row_count)]
+
+    def __len__(self):
+        return self.row_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            columns = self._column_views()
+            return [tuple(self._value(column, i) for column in columns)
+                    for i in range(*index.indices(self.row_count))]
+        if index < 0:
+            index += self.row_count
+        if not 0 <= index < self.row_count:
+            raise IndexError('result row index out of range')
+        return tuple(self._value(column, index) for column in self._column_views())
+
+    def __iter__(self):
+        columns = self._column_views()
+        for index in range(self.row_count):
+            yield tuple(self._value(column, index) for column in columns)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __add__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    def __getstate__(self):
+        # Views are rebuilt lazily after unpickling (e.g. from the shared cache)
+        state = self.__dict__.copy()
+        state['_views'] = None
+        return state
+
+class SharedQueryCache:
+    """
+    Bounded query cache stored in a named shared-memory block, so every worker
+    process on the host shares one set of cached results and invalidations.
+
+    The block is split into fixed-size slots. Reads never take a lock: each
+    slot carries a sequence number that writers make odd while they write,
+    and a reader that sees it odd or changed treats the lookup as a miss.
+    Writers serialise on a host-wide file lock.
+
+    The block is not tied to any worker's lifetime: it stays in place when
+    the worker that created it exits, so workers started later still attach
+    to the same entries. Call unlink() once when the whole deployment shuts
+    down to remove it.
+    """
+
+    HEADER = struct.Struct('QQQ')          # slot count, slot size, generation
+    SLOT_HEADER = struct.Struct('QQQId')   # seq, generation, key hash, length, stored at
+    PROBES = 4
+
+    def __init__(self, name='query_cache', slots=256, slot_size=64 * 1024):
+        """
+        Create the shared block, or attach to it if another worker already has.
+
+        Args:
+            name (str): Name of the shared-memory block shared by all workers
+            slots (int): Maximum number of cached queries
+            slot_size (int): Bytes per slot; larger results are not cached
+
+        Raises:
+            ValueError: If the existing block was created with another slot_size
+        """
+        self.name = name
+        self.slot_size = slot_size
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f'{name}.lock'), 'a')
+        size = self.HEADER.size + slots * slot_size
+        # Hold the lock so nobody attaches before the creator has written the header
+        self._lock()
+        try:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                self.HEADER.pack_into(self.shm.buf, 0, slots, slot_size, 0)
+            except FileExistsError:
+                self.shm = shared_memory.SharedMemory(name=name)
+            # Otherwise this process's resource tracker unlinks the block when it exits
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        finally:
+            self._unlock()
+        self.slots, stored_slot_size, _ = self.HEADER.unpack_from(self.shm.buf, 0)
+        if stored_slot_size != slot_size:
+            self.shm.close()
+            self._lock_file.close()
+            raise ValueError(f"Shared cache {name!r} uses slot_size={stored_slot_size}, got {slot_size}")
+
+    def _lock(self):
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+    def _unlock(self):
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _generation(self):
+        return self.HEADER.unpack_from(self.shm.buf, 0)[2]
+
+    def _offset(self, index):
+        return self.HEADER.size + index * self.slot_size
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def _probe(self, key_hash):
+        for i in range(self.PROBES):
+            yield (key_hash + i) % self.slots
+
+    def _read_slot(self, index):
+        """Return (key_hash, stored_at, payload) for a stable slot, or None."""
+        buf = self.shm.buf
+        offset = self._offset(index)
+        seq, generation, key_hash, length, stored_at = self.SLOT_HEADER.unpack_from(buf, offset)
+        if seq % 2 or not key_hash or generation != self._generation():
+            return None
+        start = offset + self.SLOT_HEADER.size
+        payload = bytes(buf[start:start + length])
+        if self.SLOT_HEADER.unpack_from(buf, offset)[0] != seq:
+            return None
+        return key_hash, stored_at, payload
+
+    def _write_slot(self, index, key_hash, payload):
+        buf = self.shm.buf
+        offset = self._offset(index)
+        seq = self.SLOT_HEADER.unpack_from(buf, offset)[0]
+        self.SLOT_HEADER.pack_into(buf, offset, seq + 1, 0, 0, 0, 0.0)
+        start = offset + self.SLOT_HEADER.size
+        buf[start:start + len(payload)] = payload
+        self.SLOT_HEADER.pack_into(buf, offset, seq + 2, self._generation(),
+                                   key_hash, len(payload), time.time())
+
+    def get(self, key, default=None):
+        key_hash = self._hash(key)
+        for index in self._probe(key_hash):
+            entry = self._read_slot(index)
+            if entry and entry[0] == key_hash:
+                stored_key, value = pickle.loads(entry[2])
+                if stored_key == key:
+                    return value
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        payload = pickle.dumps((key, value), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.slot_size - self.SLOT_HEADER.size:
+            return  # Too large for a slot - leave it uncached
+        key_hash = self._hash(key)
+        self._lock()
+        try:
+            # Reuse this key's slot or a free one, otherwise evict the oldest probe
+            victim, oldest = None, None
+            for index in self._probe(key_hash):
+                entry = self._read_slot(index)
+                if entry is None or entry[0] == key_hash:
+                    victim = index
+                    break
+                if oldest is None or entry[1] < oldest:
+                    victim, oldest = index, entry[1]
+            self._write_slot(victim, key_hash, payload)
+        finally:
+            self._unlock()
+
+    def invalidate(self, key):
+        """Drop one query from the cache for every worker."""
+        key_hash = self._hash(key)
+        self._lock()
+        try:
+            for index in self._probe(key_hash):
+                entry = self._read_slot(index)
+                if entry and entry[0] == key_hash:
+                    self._write_slot(index, 0, b'')
+        finally:
+            self._unlock()
+
+    def clear(self):
+        """Invalidate every entry at once by bumping the shared generation."""
+        self._lock()
+        try:
+            slots, slot_size, generation = self.HEADER.unpack_from(self.shm.buf, 0)
+            self.HEADER.pack_into(self.shm.buf, 0, slots, slot_size, generation + 1)
+        finally:
+            self._unlock()
+
+    def items(self):
+        for index in range(self.slots):
+            entry = self._read_slot(index)
+            if entry:
+                yield pickle.loads(entry[2])
+
+    def __len__(self):
+        return sum(1 for index in range(self.slots) if self._read_slot(index))
+
+    def close(self):
+        """Detach this worker from the block, leaving it in place for the others."""
+        self._lock_file.close()
+        self.shm.close()
+
+    def unlink(self):
+        """Remove the block for every worker; call once at deployment shutdown."""
+        # Re-register so SharedMemory.unlink()'s own unregister stays balanced
+        resource_tracker.register(self.shm._name, 'shared_memory')
+        self.shm.unlink()
+
 query_cache = {}
 
+# Store cached results as CompactResult column buffers instead of lists of tuples
+COMPACT_RESULTS = True
+COMPRESS_RESULTS = False
+
+def enable_shared_cache(name='query_cache', slots=256, slot_size=64 * 1024):
+    """
+    Switch cache_query over to a host-wide shared-memory cache.
+
+    Call once in every worker process; workers using the same name share
+    entries, the size bound and invalidations.
+    """
+    global query_cache
+    query_cache = SharedQueryCache(name, slots, slot_size)
+    return query_cache
+
+def _store_result(normalized_query, result, execution_time):
+    """
+    Store a query result in the active cache with its metadata.
+
+    Returns the stored form, which callers hand back on a miss so that a
+    miss and a later hit return the same type.
+    """
+    stored = result
+    if COMPACT_RESULTS and isinstance(result, list):
+        stored = CompactResult(result, compress=COMPRESS_RESULTS)
+    query_cache[normalized_query] = {
+        'result': stored,
+        'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'execution_time': execution_time
+    }
+    return stored
+
+def _async_cache_query(func):
+    """
+    Coroutine version of cache_query with single-flight misses: concurrent
+    callers missing on the same query await one shared execution instead
+    of each running the query.
+    """
+    in_flight = {}
+
+    async def load(normalized_query, args, kwargs):
+        start_time = time.time()
+        result = await func(*args, **kwargs)
+        return _store_result(normalized_query, result, time.time() - start_time)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        cache_key = kwargs.get('query') or (args[1] if len(args) > 1 else None)
+        if not cache_key:
+            return await func(*args, **kwargs)
+        
+        normalized_query = ' '.join(cache_key.split()).lower()
+        cached_data = query_cache.get(normalized_query)
+        if cached_data is not None:
+            return cached_data['result']
+        
+        task = in_flight.get(normalized_query)
+        if task is None:
+            task = asyncio.ensure_future(load(normalized_query, args, kwargs))
+            in_flight[normalized_query] = task
+            task.add_done_callback(lambda _: in_flight.pop(normalized_query, None))
+        # Shield so one caller being cancelled doesn't cancel the query for the others
+        return await asyncio.shield(task)
+    
+    return wrapper
+
 def cache_query(func):
     """
     Decorator that caches query results based on the SQL query string.
     Subsequent calls with the same query will return cached results.
+    Coroutine functions are cached too, with concurrent misses collapsed
+    into a single execution.
     """
+    if inspect.iscoroutinefunction(func):
+        return _async_cache_query(func)
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # Extract the query parameter to use as cache key
@@ -53,10 +524,10 @@ def cache_query(func):
         # Normalize the query for consistent caching (remove extra whitespace)
         normalized_query = ' '.join(cache_key.split()).lower()
         
-        # Check if result is already cached
-        if normalized_query in query_cache:
+        # Check if result is already cached (single lookup, entries may be evicted by other workers)
+        cached_data = query_cache.get(normalized_query)
+        if cached_data is not None:
             print(f"🎯 Cache HIT: Using cached result for query: {cache_key[:50]}...")
-            cached_data = query_cache[normalized_query]
             print(f"📊 Retrieved {len(cached_data['result'])} rows from cache")
             print(f"⏰ Original query executed at: {cached_data['timestamp']}")
             return cached_data['result']
@@ -69,12 +540,13 @@ def cache_query(func):
             result = func(*args, **kwargs)
             execution_time = time.time() - start_time
             
+            # Streaming results can't be cached without reading them all
+            if is_stream(result):
+                print("⚠️  Streaming result, not caching")
+                return result
+            
             # Store result in cache with metadata
-            query_cache[normalized_query] = {
-                'result': result,
-                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'execution_time': execution_time
-            }
+            result = _store_result(normalized_query, result, execution_time)
             
             print(f"✅ Query executed in {execution_time:.3f}s and cached")
             print(f"📊 Cached {len(result)} rows")
@@ -110,28 +582,29 @@ def fetch_users_with_cache(conn, query):
     cursor.execute(query)
     return cursor.fetchall()
 
-#### First call will cache the result
-print("=== First Query Execution ===")
-users = fetch_users_with_cache(query="SELECT * FROM users")
-print(f"Result: {users}")
+if __name__ == "__main__":
+    #### First call will cache the result
+    print("=== First Query Execution ===")
+    users = fetch_users_with_cache(query="SELECT * FROM users")
+    print(f"Result: {users}")
 
-print("\n=== Second Query Execution (Same Query) ===")
-#### Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
-print(f"Result: {users_again}")
+    print("\n=== Second Query Execution (Same Query) ===")
+    #### Second call will use the cached result
+    users_again = fetch_users_with_cache(query="SELECT * FROM users")
+    print(f"Result: {users_again}")
 
-print("\n=== Third Query Execution (Different Query) ===")
-#### Different query will not use cache
-specific_user = fetch_users_with_cache(query="SELECT * FROM users WHERE id = 1")
-print(f"Result: {specific_user}")
+    print("\n=== Third Query Execution (Different Query) ===")
+    #### Different query will not use cache
+    specific_user = fetch_users_with_cache(query="SELECT * FROM users WHERE id = 1")
+    print(f"Result: {specific_user}")
 
-print("\n=== Fourth Query Execution (Same as First) ===")
-#### This should use cache again
-users_third_time = fetch_users_with_cache(query="SELECT * FROM users")
-print(f"Result: {users_third_time}")
+    print("\n=== Fourth Query Execution (Same as First) ===")
+    #### This should use cache again
+    users_third_time = fetch_users_with_cache(query="SELECT * FROM users")
+    print(f"Result: {users_third_time}")
 
-# Show cache statistics
-show_cache_stats()
+    # Show cache statistics
+    show_cache_stats()
 
-# Demonstrate cache clearing
-# clear_query_cache()
\ No newline at end of file
+    # Demonstrate cache clearing
+    # clear_query_cache()
\ No newline at end of file
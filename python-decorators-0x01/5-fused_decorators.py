@@ -0,0 +1,251 @@
+import os
+import sys
+import time
+import timeit
+import statistics
+import inspect
+import importlib
+import functools
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def _load(name):
+    """Import one of the suite's modules (their demos only run as scripts)."""
+    return importlib.import_module(name)
+
+#### The real decorator suite, which fused() composes
+
+log_module = _load('0-log_queries')
+connection_module = _load('1-with_db_connection')
+transaction_module = _load('2-transactional')
+retry_module = _load('3-retry_on_failure')
+cache_module = _load('4-cache_query')
+
+STACK_ORDER = ('connection', 'transactional', 'retry', 'cache', 'log')
+
+def stacked(*behaviors, retries=3, delay=2, max_delay=30, deadline=None, retry_if=None, budget=None):
+    """
+    Apply the suite's decorators for `behaviors` the ordinary way, one
+    wrapper each: @with_db_connection @transactional @retry_on_failure(...)
+    @cache_query @log_queries, outermost first.
+    """
+    _check_order(behaviors)
+    decorators = {
+        'connection': connection_module.with_db_connection,
+        'transactional': transaction_module.transactional,
+        'retry': retry_module.retry_on_failure(retries, delay, max_delay, deadline,
+                                               retry_if or retry_module.is_transient, budget),
+        'cache': cache_module.cache_query,
+        'log': log_module.log_queries,
+    }
+
+    def decorator(func):
+        for name in reversed(behaviors):
+            func = decorators[name](func)
+        return func
+    return decorator
+
+def _check_order(behaviors):
+    positions = [STACK_ORDER.index(name) for name in behaviors if name in STACK_ORDER]
+    if len(positions) != len(behaviors) or positions != sorted(set(positions)):
+        raise ValueError(f"Behaviors must be a subsequence of {STACK_ORDER}, got {behaviors}")
+
+#### Fused composition
+
+def fused(*behaviors, retries=3, delay=2, max_delay=30, deadline=None, retry_if=None, budget=None):
+    """
+    Build one wrapper that behaves like stacking the suite's decorators.
+
+    `fused('connection', 'transactional', 'retry', 'cache', 'log')` matches
+    @with_db_connection @transactional @retry_on_failure() @cache_query
+    @log_queries: it checks out a connection from connection_pool, nests
+    in _transaction_depth with savepoints, retries transient errors within
+    the shared RetryBudget and deadline, stores results through
+    _store_result() and records timings in query_log, streaming results
+    included. Only the wrapper layers are collapsed - five wrapper frames
+    become three, and each behavior's flags are resolved once at decoration
+    time instead of per call. Any subset may be declared, outermost first,
+    in that order. Coroutine functions fall back to the stacked decorators.
+
+    Args:
+        *behaviors (str): Behaviors to apply, a subsequence of STACK_ORDER
+        retries, delay, max_delay, deadline, retry_if, budget: As for
+            retry_on_failure, used by the 'retry' behavior
+    """
+    _check_order(behaviors)
+    connect = 'connection' in behaviors
+    transaction = 'transactional' in behaviors
+    retry = 'retry' in behaviors
+    cache = 'cache' in behaviors
+    log = 'log' in behaviors
+    attempts = retries + 1 if retry else 1
+    retry_if = retry_if or retry_module.is_transient
+    is_stream = log_module.is_stream
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            return stacked(*behaviors, retries=retries, delay=delay, max_delay=max_delay,
+                           deadline=deadline, retry_if=retry_if, budget=budget)(func)
+
+        def logged(args, kwargs):
+            # @log_queries: times calls whose query is a string
+            query = kwargs.get('query')
+            if query is None and args:
+                query = args[0]
+            if not log or not isinstance(query, str):
+                return func(*args, **kwargs)
+            started = time.perf_counter_ns()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                log_module.query_log.record(query, time.perf_counter_ns() - started, 0, repr(e))
+                raise
+            if is_stream(result):
+                return log_module._log_stream(query, started, result)
+            rows = len(result) if hasattr(result, '__len__') else 0
+            log_module.query_log.record(query, time.perf_counter_ns() - started, rows)
+            return result
+
+        def body(*args, **kwargs):
+            # @retry_on_failure around @cache_query
+            if retry:
+                retry_tokens = budget or retry_module.retry_budget
+                retry_tokens.deposit()
+                give_up_at = time.monotonic() + deadline if deadline is not None else None
+            for attempt in range(attempts):
+                try:
+                    cache_key = None
+                    if cache:
+                        cache_key = kwargs['query'] if 'query' in kwargs else (args[1] if len(args) > 1 else None)
+                        if not cache_key:
+                            print("⚠️  No query found for caching, executing without cache")
+                    if not cache_key:
+                        result = logged(args, kwargs)
+                    else:
+                        normalized_query = ' '.join(cache_key.split()).lower()
+                        cached_data = cache_module.query_cache.get(normalized_query)
+                        if cached_data is not None:
+                            print(f"🎯 Cache HIT: Using cached result for query: {cache_key[:50]}...")
+                            print(f"📊 Retrieved {len(cached_data['result'])} rows from cache")
+                            print(f"⏰ Original query executed at: {cached_data['timestamp']}")
+                            result = cached_data['result']
+                        else:
+                            print(f"💾 Cache MISS: Executing query: {cache_key[:50]}...")
+                            start_time = time.time()
+                            try:
+                                result = logged(args, kwargs)
+                                execution_time = time.time() - start_time
+                                if is_stream(result):
+                                    print("⚠️  Streaming result, not caching")
+                                else:
+                                    result = cache_module._store_result(normalized_query, result, execution_time)
+                                    print(f"✅ Query executed in {execution_time:.3f}s and cached")
+                                    print(f"📊 Cached {len(result)} rows")
+                            except Exception as e:
+                                print(f"❌ Query failed, not caching: {e}")
+                                raise
+                    if retry:
+                        if is_stream(result):
+                            result = retry_module.prime_stream(result)
+                        if attempt > 0:
+                            print(f"Function succeeded on attempt {attempt + 1}")
+                    return result
+                except Exception as e:
+                    if not retry:
+                        raise
+                    sleep_for = retry_module._backoff_delay(e, attempt, retries, delay, max_delay,
+                                                            give_up_at, retry_tokens, retry_if)
+                    if sleep_for is None:
+                        raise
+                    time.sleep(sleep_for)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # @with_db_connection around @transactional
+            if connect:
+                pool = connection_module.connection_pool
+                conn = pool.acquire()
+                args = (conn,) + args
+            handed_off = False
+            try:
+                if not transaction:
+                    result = body(*args, **kwargs)
+                else:
+                    conn = args[0]
+                    depth = transaction_module._transaction_depth.get(id(conn), 0)
+                    if depth:
+                        result = transaction_module._run_in_savepoint(conn, depth, body, args[1:], kwargs)
+                    else:
+                        transaction_module._transaction_depth[id(conn)] = 1
+                        try:
+                            if not conn.in_transaction:
+                                conn.execute("BEGIN")
+                            result = body(*args, **kwargs)
+                        except BaseException as e:
+                            transaction_module._end_transaction(conn, e)
+                            raise
+                        if is_stream(result):
+                            result = transaction_module.ClosingIterator(
+                                result, lambda failed: transaction_module._end_transaction(
+                                    conn, "streaming failed" if failed else None))
+                        else:
+                            transaction_module._end_transaction(conn, None)
+                if connect and is_stream(result):
+                    result = connection_module.ClosingIterator(result, lambda failed: pool.release(conn))
+                    handed_off = True
+                return result
+            except Exception as e:
+                if connect:
+                    print(f"Database error: {e}")
+                raise
+            finally:
+                if connect and not handed_off:
+                    pool.release(conn)
+        return wrapper
+    return decorator
+
+#### Microbenchmark: stacked vs fused per-call overhead
+
+def benchmark(number=5000, repeat=10):
+    """
+    Time the real stacked decorators against fused() on cache hits, where
+    decorator overhead matters most, and report the median and best cost
+    per call over `repeat` rounds. The two versions alternate within each
+    round so drift in machine load affects both alike. Output from the
+    decorators is discarded while timing, and the query log writes to
+    os.devnull.
+    """
+    @stacked(*STACK_ORDER)
+    def stacked_fetch(conn, query):
+        return conn.execute(query).fetchall()
+
+    @fused(*STACK_ORDER)
+    def fused_fetch(conn, query):
+        return conn.execute(query).fetchall()
+
+    query = "SELECT * FROM users WHERE id = 1"
+    versions = (('stacked', stacked_fetch), ('fused', fused_fetch))
+    samples = {name: [] for name, fetch in versions}
+    previous_log = log_module.query_log
+    with open(os.devnull, 'w') as devnull:
+        log_module.configure_query_log(stream=devnull)
+        try:
+            with contextlib.redirect_stdout(devnull):
+                assert list(stacked_fetch(query=query)) == list(fused_fetch(query=query))
+                for _ in range(repeat):
+                    for name, fetch in versions:
+                        elapsed = timeit.timeit(lambda: fetch(query=query), number=number)
+                        samples[name].append(elapsed / number * 1e6)
+        finally:
+            log_module.query_log.flush()
+            log_module.query_log = previous_log
+    results = {name: statistics.median(values) for name, values in samples.items()}
+    for name, values in samples.items():
+        print(f"{name.capitalize() + ':':<9}{results[name]:.2f} us/call median, {min(values):.2f} best")
+    print(f"Saved:   {results['stacked'] - results['fused']:.2f} us/call "
+          f"({(1 - results['fused'] / results['stacked']) * 100:.1f}%)")
+    return results
+
+if __name__ == "__main__":
+    benchmark()